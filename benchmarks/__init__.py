@@ -0,0 +1,3 @@
+"""
+Offline benchmarks, run from a source checkout with python -m benchmarks.<name>; not installed with the package
+"""
@@ -0,0 +1,67 @@
+"""
+Compare the crypto backends verifying the same tokens.
+
+    python -m benchmarks.bench_backends --iterations 2000 --output backends.json
+"""
+import argparse
+import logging
+
+from benchmarks.bench_verification import prepare
+from benchmarks.harness import measure, write_results
+from cognitoauth import backends
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.tokens import TEST_ISS
+import cognitoauth.token_verification as auth
+
+log = logging.getLogger(__name__)
+
+
+def run(iterations, warmup, fixed_keys=False):
+    """
+    :return: dict of measure() results by case
+    """
+    data = prepare(fixed_keys)
+    keys, tokens = data["keys"], data["tokens"]
+    results = {}
+
+    for name in sorted(backends.BACKENDS):
+        try:
+            backend = backends.select_backend(name)
+        except ImportError:
+            log.warning("Skipping backend {}: not installed".format(name))
+            continue
+
+        key_set = JwkSet(keys, backend=backend)
+        for token_name in ["access", "id"]:
+            token = tokens[token_name]
+            jwt_headers, claims, signing_input, signature = auth._decode_token(token)
+            alg, key = key_set.get_key(jwt_headers["kid"])
+
+            results["{}/verify/{}".format(name, token_name)] = measure(
+                lambda: key.verify(signing_input, signature), iterations, warmup
+            )
+            results["{}/validate_jwt/{}".format(name, token_name)] = measure(
+                lambda: auth.validate_jwt(token, TEST_ISS, key_set), iterations, warmup
+            )
+
+        results["{}/load_key".format(name)] = measure(
+            lambda: backend.load_key(keys[0], "RS256"), max(1, iterations // 10), max(1, warmup // 10)
+        )
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the crypto backends verifying the same tokens")
+    parser.add_argument("--iterations", type=int, default=1000, help="timed calls per case")
+    parser.add_argument("--warmup", type=int, default=100, help="untimed calls per case")
+    parser.add_argument("--fixed-keys", action="store_true", help="use the pre-generated test keys")
+    parser.add_argument("--output", help="path of the JSON results; stdout by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    write_results("backends", run(args.iterations, args.warmup, args.fixed_keys), args.output)
+
+
+if __name__ == "__main__":
+    main()
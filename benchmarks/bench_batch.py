@@ -0,0 +1,79 @@
+"""
+Throughput of validate_many by pool type and number of workers, to check how it scales with the cores.
+
+Each case validates the same batch of distinct tokens with an executor created once, so that the pool startup is not
+measured; the speedup is relative to one worker of the same pool type.
+
+    python -m benchmarks.bench_batch --tokens 2000 --max-workers 8 --output batch.json
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+import os
+
+from benchmarks.harness import measure, write_results
+from cognitoauth.backends import get_backend
+from cognitoauth.batch import validate_many
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.tokens import TEST_ISS, jwks, mint_token
+
+log = logging.getLogger(__name__)
+
+
+def worker_counts(max_workers):
+    """
+    :param max_workers: largest number of workers
+    :return: list of 1, the powers of 2 below max_workers, and max_workers
+    """
+    counts = [1]
+    while counts[-1] * 2 < max_workers:
+        counts.append(counts[-1] * 2)
+    if max_workers > 1:
+        counts.append(max_workers)
+    return counts
+
+
+def run(iterations, warmup, token_count, max_workers, chunk_size):
+    """
+    :return: dict of measure() results by case, with the tokens validated per second and the speedup
+    """
+    key_set = JwkSet(jwks("test-kid-1", "test-kid-2")["keys"])
+    log.info("Minting {} tokens".format(token_count))
+    tokens = [mint_token(kid="test-kid-{}".format(1 + i % 2), jti="jti-{}".format(i)) for i in range(token_count)]
+
+    results = {}
+    for pool_type, executor_class in [("threads", ThreadPoolExecutor), ("processes", ProcessPoolExecutor)]:
+        single_worker_rate = None
+        for workers in worker_counts(max_workers):
+            log.info("Validating with {} {}".format(workers, pool_type))
+            with executor_class(workers) as executor:
+                result = measure(
+                    lambda: validate_many(tokens, TEST_ISS, key_set, use_processes=pool_type == "processes",
+                                          executor=executor, chunk_size=chunk_size),
+                    iterations, warmup
+                )
+            result["tokens_per_sec"] = round(result["ops_per_sec"] * token_count, 1)
+            single_worker_rate = single_worker_rate or result["tokens_per_sec"]
+            result["speedup"] = round(result["tokens_per_sec"] / single_worker_rate, 2)
+            results["validate_many/{}/{}_workers".format(pool_type, workers)] = result
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark validate_many by pool type and number of workers")
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct tokens per batch")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="largest number of workers")
+    parser.add_argument("--chunk-size", type=int, default=64, help="tokens validated per task")
+    parser.add_argument("--iterations", type=int, default=5, help="timed batches per case")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed batches per case")
+    parser.add_argument("--output", help="path of the JSON results; stdout by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    log.info("Crypto backend: {}".format(get_backend().name))
+    write_results("batch", run(args.iterations, args.warmup, args.tokens, args.max_workers, args.chunk_size),
+                  args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cost of the authorization policy check with thousands of routes and scopes, compared to checking the claims
+per request.
+
+    python -m benchmarks.bench_policy --routes 5000 --scopes 2000 --iterations 20000 --output policy.json
+"""
+import argparse
+import logging
+import random
+
+from benchmarks.harness import measure, write_results
+from cognitoauth.policy import PolicySet
+
+log = logging.getLogger(__name__)
+
+
+def naive_allows(rules, route, claims):
+    """Check of the claims of each request, as done by the handlers without a PolicySet"""
+    rule = rules.get(route)
+    if rule is None:
+        return False
+    if not set(rule.get("scopes", ())).issubset((claims.get("scope") or "").split()):
+        return False
+    groups = rule.get("groups")
+    return not groups or bool(set(groups).intersection(claims.get("cognito:groups") or ()))
+
+
+def run(iterations, warmup, routes, scopes):
+    """
+    :return: dict of measure() results by case
+    """
+    rng = random.Random(0)
+    scope_names = ["resource-{}/action-{}".format(i // 4, i % 4) for i in range(scopes)]
+    group_names = ["group-{}".format(i) for i in range(50)]
+    rules = {
+        "GET /route-{}".format(i): {"scopes": rng.sample(scope_names, 2), "groups": rng.sample(group_names, 3)}
+        for i in range(routes)
+    }
+    route = "GET /route-{}".format(routes // 2)
+    claims = {
+        "token_use": "access",
+        "scope": " ".join(rules[route]["scopes"] + rng.sample(scope_names, 20)),
+        "cognito:groups": rules[route]["groups"][:1] + rng.sample(group_names, 5),
+    }
+
+    policies = PolicySet(rules)
+    assert policies.allows(route, claims) and naive_allows(rules, route, claims)
+    return {
+        "compile": measure(lambda: PolicySet(rules), max(1, iterations // 1000), 1),
+        "policy_set/allows": measure(lambda: policies.allows(route, claims), iterations, warmup),
+        "naive/allows": measure(lambda: naive_allows(rules, route, claims), iterations, warmup),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the authorization policy check")
+    parser.add_argument("--routes", type=int, default=5000, help="number of routes")
+    parser.add_argument("--scopes", type=int, default=2000, help="number of distinct scopes")
+    parser.add_argument("--iterations", type=int, default=10000, help="timed calls per case")
+    parser.add_argument("--warmup", type=int, default=1000, help="untimed calls per case")
+    parser.add_argument("--output", help="path of the JSON results; stdout by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    write_results("policy", run(args.iterations, args.warmup, args.routes, args.scopes), args.output)
+
+
+if __name__ == "__main__":
+    main()
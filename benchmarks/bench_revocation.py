@@ -0,0 +1,65 @@
+"""
+Cost of the revocation check with a large denylist.
+
+    python -m benchmarks.bench_revocation --entries 1000000 --iterations 20000 --output revocation.json
+"""
+import argparse
+import logging
+import time
+import uuid
+
+from benchmarks.harness import measure, write_results
+from cognitoauth.cache import TokenCache
+from cognitoauth.jwks import JwkSet
+from cognitoauth.revocation import RevocationList
+from cognitoauth.tests.tokens import TEST_ISS, jwks, mint_token
+import cognitoauth.token_verification as auth
+
+log = logging.getLogger(__name__)
+
+
+def run(iterations, warmup, entries):
+    """
+    :return: dict of measure() results by case
+    """
+    now = time.time()
+    revocation_list = RevocationList()
+    log.info("Revoking {} jti and {} sub".format(entries, entries // 10))
+    revocation_list.update({"jti": str(uuid.uuid4()), "exp": now + 3600} for _ in range(entries))
+    revocation_list.update({"sub": str(uuid.uuid4()), "revoked_at": now} for _ in range(entries // 10))
+
+    revoked_jti = next(iter(revocation_list._jtis))
+    claims = {"jti": str(uuid.uuid4()), "sub": str(uuid.uuid4()), "iat": int(now)}
+    revoked_claims = dict(claims, jti=revoked_jti)
+    results = {
+        "is_revoked/not_revoked": measure(lambda: revocation_list.is_revoked(claims), iterations, warmup),
+        "is_revoked/revoked_jti": measure(lambda: revocation_list.is_revoked(revoked_claims), iterations, warmup),
+    }
+
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+    token = mint_token(jti=str(uuid.uuid4()))
+    token_cache = TokenCache()
+    results["verify_token/token_cache"] = measure(
+        lambda: auth.verify_token(token, TEST_ISS, key_set, token_cache), iterations, warmup
+    )
+    results["verify_token/token_cache_revocation_list"] = measure(
+        lambda: auth.verify_token(token, TEST_ISS, key_set, token_cache, revocation_list=revocation_list),
+        iterations, warmup
+    )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the revocation check")
+    parser.add_argument("--entries", type=int, default=1000000, help="number of revoked jti")
+    parser.add_argument("--iterations", type=int, default=10000, help="timed calls per case")
+    parser.add_argument("--warmup", type=int, default=1000, help="untimed calls per case")
+    parser.add_argument("--output", help="path of the JSON results; stdout by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    write_results("revocation", run(args.iterations, args.warmup, args.entries), args.output)
+
+
+if __name__ == "__main__":
+    main()
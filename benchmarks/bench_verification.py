@@ -0,0 +1,129 @@
+"""
+Offline benchmark of the verification hot path.
+
+Generates local RSA keys and a JWKS, mints valid, expired and wrong-kid access and id tokens, and measures
+retrieve_header_token, get_username_from_token, validate_jwt, authorise_request and authorise_request_result without
+any network access.
+
+    python -m benchmarks.bench_verification --iterations 2000 --output results.json
+"""
+import argparse
+import logging
+
+from benchmarks.harness import measure, write_results
+from cognitoauth.cache import TokenCache
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.tokens import (
+    PRIVATE_KEYS, TEST_ISS, TEST_REGION, TEST_USERPOOL_ID, generate_private_key, jwks, mint_token
+)
+import cognitoauth.token_verification as auth
+
+log = logging.getLogger(__name__)
+
+
+class Request(object):
+    """Minimal request with the headers read by retrieve_header_token"""
+
+    def __init__(self, token):
+        self.headers = {"Authorization": auth.BEARER_PREFIX + token}
+
+
+def prepare(fixed_keys=False):
+    """
+    Prepare the keys and the tokens used by the benchmark
+    :param fixed_keys: True to use the pre-generated test keys instead of generating new ones
+    :return: dict with the keys and the tokens
+    """
+    if fixed_keys:
+        private_keys = PRIVATE_KEYS
+    else:
+        log.info("Generating RSA keys")
+        private_keys = {kid: generate_private_key() for kid in ["bench-kid-1", "bench-kid-2", "bench-kid-3"]}
+    kid_1, kid_2, kid_3 = sorted(private_keys)
+
+    def mint(**kwargs):
+        return mint_token(private_keys=private_keys, **kwargs)
+
+    return {
+        "keys": jwks(kid_1, kid_2, private_keys=private_keys)["keys"],
+        "tokens": {
+            "access": mint(kid=kid_1),
+            "id": mint(kid=kid_2, token_use="id"),
+            "expired_access": mint(kid=kid_1, expires_in=-60),
+            "expired_id": mint(kid=kid_2, token_use="id", expires_in=-60),
+            "wrong_kid_access": mint(kid=kid_3),
+            "wrong_kid_id": mint(kid=kid_3, token_use="id"),
+        },
+    }
+
+
+def run(iterations, warmup, fixed_keys=False):
+    """
+    :return: dict of measure() results by case
+    """
+    data = prepare(fixed_keys)
+    keys, tokens = data["keys"], data["tokens"]
+    key_set = JwkSet(keys)
+    results = {}
+
+    request = Request(tokens["access"])
+    results["retrieve_header_token"] = measure(lambda: auth.retrieve_header_token(request), iterations, warmup)
+
+    for name in ["access", "id"]:
+        token = tokens[name]
+        results["get_username_from_token/{}".format(name)] = measure(
+            lambda: auth.get_username_from_token(token), iterations, warmup
+        )
+
+    for name, token in sorted(tokens.items()):
+        results["validate_jwt/{}/keys_list".format(name)] = measure(
+            lambda: auth.validate_jwt(token, TEST_ISS, keys), iterations, warmup
+        )
+        results["validate_jwt/{}/jwk_set".format(name)] = measure(
+            lambda: auth.validate_jwt(token, TEST_ISS, key_set), iterations, warmup
+        )
+
+    for name in ["access", "id"]:
+        request = Request(tokens[name])
+        results["authorise_request/{}/keys_list".format(name)] = measure(
+            lambda: auth.authorise_request(request, TEST_REGION, TEST_USERPOOL_ID, keys), iterations, warmup
+        )
+        results["authorise_request/{}/jwk_set".format(name)] = measure(
+            lambda: auth.authorise_request(request, TEST_REGION, TEST_USERPOOL_ID, key_set), iterations, warmup
+        )
+        token_cache = TokenCache()
+        results["authorise_request/{}/jwk_set_token_cache".format(name)] = measure(
+            lambda: auth.authorise_request(request, TEST_REGION, TEST_USERPOOL_ID, key_set, token_cache),
+            iterations, warmup
+        )
+
+    def rejected(request):
+        try:
+            auth.authorise_request(request, TEST_REGION, TEST_USERPOOL_ID, key_set)
+        except Exception as e:
+            return e
+
+    for name in ["expired_access", "wrong_kid_access"]:
+        request = Request(tokens[name])
+        results["authorise_request/{}/raising".format(name)] = measure(lambda: rejected(request), iterations, warmup)
+        results["authorise_request_result/{}".format(name)] = measure(
+            lambda: auth.authorise_request_result(request, TEST_REGION, TEST_USERPOOL_ID, key_set), iterations, warmup
+        )
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the token verification hot path")
+    parser.add_argument("--iterations", type=int, default=1000, help="timed calls per case")
+    parser.add_argument("--warmup", type=int, default=100, help="untimed calls per case")
+    parser.add_argument("--fixed-keys", action="store_true", help="use the pre-generated test keys")
+    parser.add_argument("--output", help="path of the JSON results; stdout by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    write_results("verification", run(args.iterations, args.warmup, args.fixed_keys), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Helpers to time a function and report its throughput and latency percentiles as JSON
+"""
+import json
+import os
+import platform
+import sys
+import time
+
+from cognitoauth.tests.soak import percentile
+
+
+def measure(func, iterations=1000, warmup=100):
+    """
+    Call func repeatedly and time each call
+    :param func: function called without arguments
+    :param iterations: number of timed calls
+    :param warmup: number of calls made before timing
+    :return: dict with the throughput in calls per second and the latency percentiles in microseconds
+    """
+    for _ in range(warmup):
+        func()
+
+    timer = time.perf_counter_ns
+    durations = []
+    start = timer()
+    for _ in range(iterations):
+        call_start = timer()
+        func()
+        durations.append(timer() - call_start)
+    elapsed = timer() - start
+
+    durations.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / (elapsed / 1e9), 1),
+        "mean_us": round(sum(durations) / len(durations) / 1e3, 2),
+        "p50_us": round(percentile(durations, 50) / 1e3, 2),
+        "p90_us": round(percentile(durations, 90) / 1e3, 2),
+        "p99_us": round(percentile(durations, 99) / 1e3, 2),
+        "max_us": round(durations[-1] / 1e3, 2),
+    }
+
+
+def environment():
+    """
+    :return: dict describing the environment the benchmark runs in
+    """
+    versions = {}
+    for package in ["cognitoauth", "python-jose", "rsa", "cryptography"]:
+        try:
+            from importlib.metadata import version
+            versions[package] = version(package)
+        except Exception:
+            versions[package] = None
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+        "timestamp": int(time.time()),
+    }
+
+
+def write_results(name, results, output=None):
+    """
+    Write the results of a benchmark as JSON
+    :param name: string with the name of the benchmark
+    :param results: dict of measure() results by case
+    :param output: optional path of the JSON file; stdout if not given
+    """
+    document = {"benchmark": name, "environment": environment(), "results": results}
+    if output:
+        with open(output, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
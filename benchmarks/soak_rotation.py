@@ -0,0 +1,44 @@
+"""
+Key rotation soak run: concurrent authorise_request load against a local JWKS stand-in server rotating its keys,
+optionally slow and failing during the rotation. Reports the p50/p99 latency and the error rate before, during and
+after the rotation.
+
+    python -m benchmarks.soak_rotation --duration 10 --concurrency 8 --latency 0.2 --failure-rate 0.3
+"""
+import argparse
+import logging
+
+from benchmarks.harness import write_results
+from cognitoauth.provider import JwksProvider
+from cognitoauth.tests.soak import rotation_phases, run_soak, static_keys_factory
+
+log = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak the key handling with a key rotation")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per phase")
+    parser.add_argument("--concurrency", type=int, default=4, help="number of threads calling authorise_request")
+    parser.add_argument("--latency", type=float, default=0, help="seconds of latency of the JWKS during rotation")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of JWKS requests failing during "
+                                                                      "rotation")
+    parser.add_argument("--min-refetch-interval", type=float, default=1,
+                        help="refetch rate limit of the JwksProvider, in seconds")
+    parser.add_argument("--static-keys", action="store_true", help="download the keys once instead of a JwksProvider")
+    parser.add_argument("--output", help="path of the JSON results; stdout by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.static_keys:
+        keys_factory = static_keys_factory
+    else:
+        def keys_factory(userpool_iss):
+            return JwksProvider(userpool_iss, min_refetch_interval=args.min_refetch_interval)
+
+    phases = rotation_phases(args.duration, args.latency, args.failure_rate)
+    reports = run_soak(phases, keys_factory, concurrency=args.concurrency)
+    write_results("soak_rotation", {report["phase"]: report for report in reports}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+asyncio counterparts of authorise_request and JwksProvider, for async (ASGI) web frameworks.
+
+The JWT Set download and the signature checks run in a bounded executor so that the event loop is never blocked;
+tokens found in the TokenCache are returned on the event loop without leaving it.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+import threading
+
+from cognitoauth import instrumentation
+from cognitoauth.provider import JwksProvider
+from cognitoauth.reasons import FailureReason, format_message
+from cognitoauth.token_verification import (
+    _cached_result, _verify, cognito_userpool_iss, retrieve_header_token
+)
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def default_executor():
+    """
+    Return the executor shared by the verifications that are not given one
+    :return: ThreadPoolExecutor bounded to the number of CPUs (at most 8 workers)
+    """
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(
+                max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="cognitoauth"
+            )
+    return _default_executor
+
+
+class AsyncJwksProvider(object):
+    """
+    JwksProvider for asyncio: downloads never run on the event loop.
+
+    userpool_keys = AsyncJwksProvider(cognito_userpool_iss(cognito_region, cognito_userpool_id)).start()
+    username = await authorise_request_async(request, cognito_region, cognito_userpool_id, userpool_keys)
+    """
+
+    def __init__(self, userpool_iss, executor=None, **kwargs):
+        """
+        :param userpool_iss: string with Cognito User Pool ISS
+        :param executor: optional executor running the downloads; default_executor() by default
+        :param kwargs: keyword arguments of JwksProvider
+        """
+        self.provider = JwksProvider(userpool_iss, **kwargs)
+        self._executor = executor
+
+    @property
+    def key_set(self):
+        """Current JwkSet of the User Pool"""
+        return self.provider.key_set
+
+    def get_key(self, kid):
+        """
+        Not available: the synchronous functions need a JwksProvider, e.g. the provider attribute
+        :raise TypeError: always
+        """
+        raise TypeError("AsyncJwksProvider only works with the cognitoauth.aio functions; "
+                        "pass its provider attribute, a JwksProvider, to the synchronous functions")
+
+    async def get_key_async(self, kid):
+        """
+        Return the key of the given kid, refetching the keys once if the kid is unknown
+        :param kid: string with the kid of the key
+        :return: tuple (alg, key) as returned by JwkSet.get_key; None if not found
+        """
+        key = self.provider.key_set.get_key(kid)
+        if key is None:
+            loop = asyncio.get_running_loop()
+            key = await loop.run_in_executor(self._executor or default_executor(), self.provider.get_key, kid)
+        return key
+
+    async def refresh(self):
+        """
+        Download the keys now
+        :return: True if the keys were downloaded; False otherwise
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor or default_executor(), self.provider.refresh)
+
+    def start(self):
+        """
+        Start refreshing the keys in the background
+        :return: self
+        """
+        self.provider.start()
+        return self
+
+    async def stop(self):
+        """Stop refreshing the keys in the background"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.provider.stop)
+
+
+async def verify_token_async(token, userpool_iss, userpool_keys, token_cache=None, executor=None,
+                             revocation_list=None):
+    """
+    asyncio version of verify_token
+    :param token: jwt string
+    :param userpool_iss: string with url base to check issuer
+    :param userpool_keys: AsyncJwksProvider, JwksProvider, JwkSet, or json with JSON Web Keys of the User Pool
+    :param token_cache: optional TokenCache; a cached token is returned without leaving the event loop
+    :param executor: optional executor running the signature checks; default_executor() by default
+    :param revocation_list: optional RevocationList of revoked tokens
+    :return: tuple (claims, username, err_msg) as returned by verify_token
+    """
+    result = await verify_token_result_async(token, userpool_iss, userpool_keys, token_cache, executor,
+                                             revocation_list)
+    return result.as_tuple()
+
+
+async def verify_token_result_async(token, userpool_iss, userpool_keys, token_cache=None, executor=None,
+                                    revocation_list=None):
+    """
+    Same as verify_token_async, returning a VerificationResult whose error message is only formatted when read
+    :return: VerificationResult; true if the token is verified
+    """
+    if token_cache is not None:
+        cached = _cached_result(token, userpool_iss, token_cache, revocation_list)
+        if cached is not None:
+            return cached
+
+    if isinstance(userpool_keys, AsyncJwksProvider):
+        # The executor thread may download the keys, without blocking the event loop
+        userpool_keys = userpool_keys.provider
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor or default_executor(), functools.partial(
+            _verify, token, userpool_iss, userpool_keys, token_cache, revocation_list=revocation_list
+        )
+    )
+
+
+async def authorise_request_async(request, cognito_region, cognito_userpool_id, userpool_keys, token_cache=None,
+                                  executor=None, revocation_list=None):
+    """
+    asyncio version of authorise_request
+    :param request: request with the token in its Authorization header
+    :param cognito_region: string with region for Cognito User Pool
+    :param cognito_userpool_id: string with Cognito User Pool ID
+    :param userpool_keys: AsyncJwksProvider, JwksProvider, JwkSet, or JSON Web Keys
+    :param token_cache: optional TokenCache of verified tokens
+    :param executor: optional executor running the signature checks; default_executor() by default
+    :param revocation_list: optional RevocationList of revoked tokens
+    :return: username
+    """
+    token = retrieve_header_token(request)
+
+    userpool_iss = cognito_userpool_iss(cognito_region, cognito_userpool_id)
+
+    claims, username, err_msg = await verify_token_async(token, userpool_iss, userpool_keys, token_cache, executor,
+                                                         revocation_list)
+    if err_msg is not None:
+        raise Exception("Token validation failed: {}".format(err_msg))
+    if username is None:
+        instrumentation.get_instrumentation().count("rejected", FailureReason.MISSING_USERNAME.value)
+        raise Exception(format_message(FailureReason.MISSING_USERNAME))
+
+    return username
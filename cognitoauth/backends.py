@@ -0,0 +1,126 @@
+"""
+Crypto backends building the RS256 verifier keys of a JwkSet.
+
+The cryptography backend verifies signatures directly with the RSA public keys of cryptography (OpenSSL), without
+the overhead of python-jose, which may also fall back to a pure python RSA implementation. It is selected when
+cryptography is installed (pip install cognitoauth[cryptography]); python-jose is the fallback.
+"""
+import logging
+import threading
+
+from cognitoauth.utils import base64url_decode
+
+log = logging.getLogger(__name__)
+
+
+class JoseBackend(object):
+    """
+    Backend verifying signatures with python-jose
+    """
+    name = "jose"
+
+    def load_key(self, key, alg):
+        """
+        :param key: dict with the JSON Web Key
+        :param alg: string with the algorithm of the key
+        :return: key with a verify(signing_input, signature) method returning True if the signature is valid
+        """
+        from jose import jwk
+        return jwk.construct(key, alg)
+
+
+class CryptographyBackend(object):
+    """
+    Backend verifying RS256 signatures with the RSA public keys of cryptography
+    """
+    name = "cryptography"
+
+    def __init__(self):
+        # Raise ImportError now if cryptography is not installed
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding, rsa
+        self._invalid_signature = InvalidSignature
+        self._hash = hashes.SHA256()
+        self._padding = padding.PKCS1v15()
+        self._rsa = rsa
+
+    def load_key(self, key, alg):
+        """
+        :param key: dict with the JSON Web Key
+        :param alg: string with the algorithm of the key; only RS256 is supported
+        :return: key with a verify(signing_input, signature) method returning True if the signature is valid
+        """
+        if alg != "RS256" or key.get("kty") != "RSA":
+            raise ValueError("Unsupported key {} {}".format(key.get("kty"), alg))
+        n = int.from_bytes(base64url_decode(key["n"]), "big")
+        e = int.from_bytes(base64url_decode(key["e"]), "big")
+        return CryptographyRS256Key(self, self._rsa.RSAPublicNumbers(e, n).public_key())
+
+
+class CryptographyRS256Key(object):
+    """
+    RS256 verifier key of the cryptography backend
+    """
+    __slots__ = ("_backend", "_public_key")
+
+    def __init__(self, backend, public_key):
+        self._backend = backend
+        self._public_key = public_key
+
+    def verify(self, signing_input, signature):
+        """
+        :param signing_input: bytes with the header and claims segments of the token
+        :param signature: bytes with the decoded signature
+        :return: True if the signature is valid; False otherwise
+        """
+        try:
+            self._public_key.verify(signature, signing_input, self._backend._padding, self._backend._hash)
+            return True
+        except self._backend._invalid_signature:
+            return False
+
+
+BACKENDS = {
+    JoseBackend.name: JoseBackend,
+    CryptographyBackend.name: CryptographyBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def select_backend(name=None):
+    """
+    Create a backend
+    :param name: optional string with the name of the backend; the fastest available one by default
+    :return: backend
+    """
+    if name is not None:
+        return BACKENDS[name]()
+    try:
+        return CryptographyBackend()
+    except ImportError:
+        log.info("cryptography is not installed; falling back to python-jose")
+        return JoseBackend()
+
+
+def get_backend():
+    """
+    :return: the backend used by the JwkSet created without one, selected on first use
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = select_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Set the backend used by the JwkSet created without one from now on
+    :param backend: backend, or string with the name of the backend; None to select it again on first use
+    """
+    global _backend
+    _backend = select_backend(backend) if isinstance(backend, str) else backend
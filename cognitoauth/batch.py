@@ -0,0 +1,186 @@
+"""
+Verification of many tokens at once, e.g. when replaying gateway traffic or checking sessions again after a key
+rotation.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import itertools
+import os
+import time
+
+from cognitoauth import instrumentation
+from cognitoauth.jwks import JwkSet
+from cognitoauth.reasons import FailureReason, format_message
+from cognitoauth.token_verification import _decode_token, _reject_unverified, validate_jwt, verify_token
+
+# Issuer and keys of the current worker process of verify_stream
+_worker_iss = None
+_worker_keys = None
+
+
+def validate_many(tokens, userpool_iss, userpool_keys, max_workers=None, use_processes=False, executor=None,
+                  chunk_size=64):
+    """
+    Validate many tokens, spreading the signature checks across a pool of threads or processes.
+
+    Identical tokens are validated once, and tokens are grouped by kid so that each key is resolved once, by the
+    calling thread: threads are given the resolved key, processes the JSON Web Key of the kid, built once per task.
+    With the pure python RSA backend, only processes scale with the number of CPUs.
+    :param tokens: iterable of jwt strings
+    :param userpool_iss: string with url base to check issuer
+    :param userpool_keys: JwksProvider, JwkSet, or json with JSON Web Keys of the User Pool
+    :param max_workers: number of workers of the pool created if no executor is given
+    :param use_processes: True to create a pool of processes; False for a pool of threads
+    :param executor: optional concurrent.futures executor to use instead of creating a pool
+    :param chunk_size: number of tokens validated per task
+    :return: list of tuples (passed, err_msg) as returned by validate_jwt, in the order of tokens
+    """
+    tokens = list(tokens)
+    key_set = userpool_keys if hasattr(userpool_keys, "get_key") else JwkSet(userpool_keys)
+
+    results = {}
+    tokens_by_kid = {}
+    now = time.time()
+    for token in dict.fromkeys(tokens):
+        kid = _token_kid(token, userpool_iss, now)
+        if kid is None:
+            # Malformed, foreign or expired token: fails without any key lookup or crypto
+            results[token] = validate_jwt(token, userpool_iss, key_set)
+        else:
+            tokens_by_kid.setdefault(kid, []).append(token)
+
+    tasks = []
+    for kid, kid_tokens in tokens_by_kid.items():
+        key = key_set.get_key(kid)
+        if key is None:
+            instrument = instrumentation.get_instrumentation()
+            for token in kid_tokens:
+                instrument.count("rejected", FailureReason.UNKNOWN_KID.value)
+                results[token] = (False, format_message(FailureReason.UNKNOWN_KID))
+            continue
+        # Built keys cannot be pickled: processes get the JSON Web Key of the kid only, rebuilt once per task
+        keys = JwkSet([key_set.get_jwk(kid)]) if use_processes else _ResolvedKey(kid, key)
+        for i in range(0, len(kid_tokens), chunk_size):
+            tasks.append((kid_tokens[i:i + chunk_size], keys))
+
+    if len(tasks) == 1 and executor is None:
+        chunk, keys = tasks[0]
+        results.update(zip(chunk, _validate_chunk(chunk, userpool_iss, keys)))
+    elif tasks:
+        pool = executor
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers) if use_processes else ThreadPoolExecutor(max_workers)
+        try:
+            futures = [(chunk, pool.submit(_validate_chunk, chunk, userpool_iss, keys)) for chunk, keys in tasks]
+            for chunk, future in futures:
+                results.update(zip(chunk, future.result()))
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+    return [results[token] for token in tokens]
+
+
+def verify_stream(items, userpool_iss, userpool_keys, max_workers=None, chunk_size=256, max_pending=None):
+    """
+    Verify a stream of tokens across a pool of processes, in constant memory.
+
+    Chunks of tokens are verified by the processes while the next ones are read, with at most max_pending chunks
+    in flight, and the results are yielded in the order of the stream.
+    :param items: iterable of tuples (token, now): jwt string, or None if there is no token, and epoch time in
+        seconds at which the token must be valid, or None for the current time
+    :param userpool_iss: string with url base to check issuer
+    :param userpool_keys: JwkSet, or json with JSON Web Keys of the User Pool
+    :param max_workers: number of processes; 0 to verify in the current process
+    :param chunk_size: number of tokens verified per task
+    :param max_pending: maximum number of chunks in flight; twice the number of processes by default
+    :return: iterator of tuples (claims, username, err_msg) as returned by verify_token, in the order of items
+    """
+    key_set = userpool_keys if isinstance(userpool_keys, JwkSet) else JwkSet(userpool_keys)
+    items = iter(items)
+    chunks = iter(lambda: list(itertools.islice(items, chunk_size)), [])
+
+    if max_workers == 0:
+        _init_worker(userpool_iss, key_set)
+        for chunk in chunks:
+            for result in _verify_chunk(chunk):
+                yield result
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+    # Each process rebuilds the keys once
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(userpool_iss, key_set)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= max_pending:
+                for result in pending.popleft().result():
+                    yield result
+            pending.append(pool.submit(_verify_chunk, chunk))
+        while pending:
+            for result in pending.popleft().result():
+                yield result
+
+
+def _init_worker(userpool_iss, userpool_keys):
+    global _worker_iss, _worker_keys
+    _worker_iss = userpool_iss
+    _worker_keys = userpool_keys
+
+
+def _verify_chunk(items):
+    """
+    :param items: list of tuples (token, now)
+    :return: list of tuples (claims, username, err_msg) in the order of items
+    """
+    results = {}
+    for item in items:
+        if item not in results:
+            token, now = item
+            if token is None:
+                results[item] = (None, None, format_message(FailureReason.NO_TOKEN))
+                continue
+            try:
+                results[item] = verify_token(token, _worker_iss, _worker_keys, now=now)
+            except Exception as e:
+                # A hostile token must not cost the results of the other items
+                results[item] = (None, None, "Failed to verify token: {}".format(e))
+    return [results[item] for item in items]
+
+
+class _ResolvedKey(object):
+    """
+    Key of a single kid, resolved once for the tokens of that kid
+    """
+    __slots__ = ("kid", "key")
+
+    def __init__(self, kid, key):
+        self.kid = kid
+        self.key = key
+
+    def get_key(self, kid):
+        return self.key if kid == self.kid else None
+
+
+def _validate_chunk(tokens, userpool_iss, userpool_keys):
+    """
+    :return: list of tuples (passed, err_msg) in the order of tokens
+    """
+    return [validate_jwt(token, userpool_iss, userpool_keys) for token in tokens]
+
+
+def _token_kid(token, userpool_iss, now):
+    """
+    :param token: jwt string
+    :param userpool_iss: string with url base to check issuer
+    :param now: current epoch time in seconds
+    :return: kid in the header of the token; None if the token is malformed or rejected by its unverified claims
+    """
+    try:
+        jwt_headers, claims, _, _ = _decode_token(token)
+    except Exception:
+        return None
+    kid = jwt_headers.get("kid")
+    if not isinstance(kid, str) or _reject_unverified(jwt_headers, claims, userpool_iss, now) is not None:
+        return None
+    return kid
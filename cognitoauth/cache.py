@@ -0,0 +1,108 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+
+class TokenCache(object):
+    """
+    Bounded LRU cache of verified tokens, so that a token sent on many requests is verified once.
+    Entries are keyed by a digest of the token and never outlive the exp claim of the token. The claims are copied
+    when cached and when returned, so that callers adding keys to them do not change the cached entries.
+
+    token_cache = TokenCache(maxsize=10000)
+    username = authorise_request(request, cognito_region, cognito_userpool_id, userpool_keys, token_cache)
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.time):
+        """
+        :param maxsize: maximum number of tokens kept in the cache
+        :param ttl: optional maximum number of seconds a token is kept, if shorter than its expiry
+        :param timer: function returning the current epoch time in seconds
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def digest(token):
+        """
+        :param token: jwt string
+        :return: bytes with the digest of the token used as cache key
+        """
+        if isinstance(token, str):
+            token = token.encode("utf-8")
+        return hashlib.sha256(token).digest()
+
+    def get(self, token, issuers=None):
+        """
+        :param token: jwt string
+        :param issuers: optional container of the issuers accepted; a token of another issuer is a miss
+        :return: tuple (username, claims) of the verified token, with a copy of its claims; None if not cached,
+            expired or of another issuer
+        """
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, username, claims = entry
+            if expires_at <= self._timer():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if issuers is not None and claims.get("iss") not in issuers:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return username, dict(claims)
+
+    def put(self, token, username, claims):
+        """
+        Cache a verified token until it expires
+        :param token: jwt string
+        :param username: string with the username of the token
+        :param claims: dict with the verified claims of the token
+        """
+        expires_at = claims["exp"]
+        if self.ttl is not None:
+            expires_at = min(expires_at, self._timer() + self.ttl)
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (expires_at, username, dict(claims))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all the cached tokens"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        :return: dict with the size and the hit, miss, eviction and expiration counters of the cache
+        """
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
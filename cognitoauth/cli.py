@@ -0,0 +1,204 @@
+"""
+Command line verification of the tokens of access logs, e.g. to find which requests had a valid token.
+
+The log lines are streamed, their tokens are verified against a jwks.json file by a pool of processes, and one JSON
+result is written per line, in the order of the lines:
+
+cognitoauth-verify --jwks jwks.json --region ap-southeast-2 --user-pool-id ap-southeast-2_xxxxxxxxx \\
+    --format jsonl --field headers.Authorization --time-field requestTime access.log.gz > results.jsonl
+"""
+import argparse
+import datetime
+import gzip
+import json
+import math
+import re
+import sys
+
+from cognitoauth.batch import verify_stream
+from cognitoauth.token_verification import cognito_userpool_iss, header_token
+
+# Token of a plain text line, with or without its Bearer prefix
+TOKEN_PATTERN = re.compile(r"(?:Bearer\s+)?(eyJ[A-Za-z0-9_-]*\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*)")
+
+# Larger epoch times are in milliseconds, e.g. $context.requestTimeEpoch of API Gateway; 10**11 seconds is year 5138
+MAX_EPOCH_SECONDS = 10 ** 11
+
+# Common Log Format time, e.g. $context.requestTime of API Gateway: 16/Oct/2026:21:21:52 +0000
+CLF_TIME_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+
+def parse_time(value):
+    """
+    :param value: epoch time in seconds or milliseconds, or string with an epoch time, a Common Log Format time or an
+        ISO 8601 date time; UTC if no timezone
+    :return: epoch time in seconds
+    """
+    if isinstance(value, bool):
+        raise TypeError("Invalid time: {}".format(value))
+    try:
+        epoch = float(value)
+    except ValueError:
+        pass
+    else:
+        if not math.isfinite(epoch):
+            raise ValueError("Invalid time: {}".format(value))
+        return epoch / 1000 if abs(epoch) >= MAX_EPOCH_SECONDS else epoch
+    try:
+        return datetime.datetime.strptime(value, CLF_TIME_FORMAT).timestamp()
+    except ValueError:
+        pass
+    date_time = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if date_time.tzinfo is None:
+        date_time = date_time.replace(tzinfo=datetime.timezone.utc)
+    return date_time.timestamp()
+
+
+def json_field(record, path):
+    """
+    :param record: dict decoded from a JSON line
+    :param path: dotted path of the field, matched case-insensitively, e.g. headers.Authorization
+    :return: value of the field; None if missing
+    """
+    value = record
+    for name in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        if name in value:
+            value = value[name]
+            continue
+        name = name.lower()
+        value = next((item for key, item in value.items() if key.lower() == name), None)
+    return value
+
+
+def text_token(line):
+    """
+    :param line: string with a plain text log line
+    :return: string with the first token of the line; None if there is none
+    """
+    match = TOKEN_PATTERN.search(line)
+    return match.group(1) if match else None
+
+
+def jsonl_token(line, field, time_field=None):
+    """
+    :param line: string with a JSON log line
+    :param field: dotted path of the field with the Authorization header value
+    :param time_field: optional dotted path of the field with the time of the request
+    :return: tuple (token, now, err_msg); token is None if there is none, now is None if there is no time, err_msg is
+        None unless the time cannot be parsed
+    """
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, None, None
+    authorization = json_field(record, field)
+    token = header_token(authorization) if isinstance(authorization, str) else None
+    now = json_field(record, time_field) if time_field else None
+    if now is not None:
+        try:
+            now = parse_time(now)
+        except (ValueError, TypeError, AttributeError):
+            return token, None, "Invalid request time: {}".format(now)
+    return token, now, None
+
+
+def read_lines(paths):
+    """
+    :param paths: list of paths of log files, gzipped if ending with .gz; - for the standard input
+    :return: iterator of the lines
+    """
+    for path in paths or ["-"]:
+        if path == "-":
+            stream = sys.stdin
+        elif path.endswith(".gz"):
+            stream = gzip.open(path, "rt", errors="replace")
+        else:
+            stream = open(path, errors="replace")
+        try:
+            for line in stream:
+                yield line
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def load_keys(path):
+    """
+    :param path: string with the path of a jwks.json file, or of a JSON list of JSON Web Keys
+    :return: json with JSON Web Keys
+    """
+    with open(path) as f:
+        keys = json.load(f)
+    return keys["keys"] if isinstance(keys, dict) else keys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the Cognito tokens of access logs")
+    parser.add_argument("paths", nargs="*", help="log files, gzipped if ending with .gz; standard input by default")
+    parser.add_argument("--jwks", required=True, help="path of the jwks.json of the User Pool")
+    parser.add_argument("--issuer", help="issuer of the User Pool; or --region and --user-pool-id")
+    parser.add_argument("--region", help="region of the User Pool")
+    parser.add_argument("--user-pool-id", help="ID of the User Pool")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text",
+                        help="text: first token of each line; jsonl: token in --field of each JSON line")
+    parser.add_argument("--field", default="headers.Authorization",
+                        help="dotted path of the Authorization header in the JSON lines")
+    parser.add_argument("--time-field", help="dotted path of the time of the request in the JSON lines: epoch seconds "
+                                             "or milliseconds, Common Log Format or ISO 8601 time")
+    parser.add_argument("--as-of", help="epoch, Common Log Format or ISO 8601 time at which the tokens must be valid; "
+                                        "now by default")
+    parser.add_argument("--workers", type=int, help="number of processes; 0 for none; CPU count by default")
+    parser.add_argument("--chunk-size", type=int, default=256, help="number of tokens verified per task")
+    parser.add_argument("--output", help="path of the JSON lines results; stdout by default")
+    args = parser.parse_args(argv)
+
+    if args.issuer:
+        userpool_iss = args.issuer
+    elif args.region and args.user_pool_id:
+        userpool_iss = cognito_userpool_iss(args.region, args.user_pool_id)
+    else:
+        parser.error("--issuer, or --region and --user-pool-id, are required")
+    as_of = parse_time(args.as_of) if args.as_of else None
+
+    # Errors of the lines read but not written yet, by line number
+    line_errors = {}
+
+    def items():
+        for number, line in enumerate(read_lines(args.paths), 1):
+            if args.format == "jsonl":
+                token, now, err_msg = jsonl_token(line, args.field, args.time_field)
+                if err_msg is not None:
+                    # Not verified at the wrong time
+                    line_errors[number] = err_msg
+                    token = None
+            else:
+                token, now = text_token(line), None
+            yield token, as_of if now is None else now
+
+    results = verify_stream(items(), userpool_iss, load_keys(args.jwks), max_workers=args.workers,
+                            chunk_size=args.chunk_size)
+    output = open(args.output, "w") if args.output else sys.stdout
+    valid = total = 0
+    try:
+        for total, (claims, username, err_msg) in enumerate(results, 1):
+            err_msg = line_errors.pop(total, err_msg)
+            valid += err_msg is None
+            output.write(json.dumps({
+                "line": total,
+                "valid": err_msg is None,
+                "username": username,
+                "sub": claims.get("sub") if claims else None,
+                "exp": claims.get("exp") if claims else None,
+                "error": err_msg,
+            }) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    sys.stderr.write("{} lines: {} valid, {} invalid\n".format(total, valid, total - valid))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Pluggable instrumentation of the verification path.
+
+The time spent in each stage ("decode", "claims", "key_lookup", "signature", "revocation" when a RevocationList is
+given, "jwks_download") is reported to timing(), and events ("verified", "rejected" with a FailureReason code,
+"cache_hit", "jwks_download_failed") to count(). Instrumentation is a no-op until set_instrumentation() is called.
+
+set_instrumentation(StatsdInstrumentation(statsd.StatsClient()))
+"""
+
+
+class Instrumentation(object):
+    """
+    Base class of the instrumentations; does nothing
+    """
+
+    def timing(self, stage, seconds):
+        """
+        :param stage: string with the name of the stage
+        :param seconds: float with the duration of the stage
+        """
+
+    def count(self, event, reason=None):
+        """
+        :param event: string with the name of the event
+        :param reason: optional string with the FailureReason code of a "rejected" event
+        """
+
+
+NULL_INSTRUMENTATION = Instrumentation()
+
+_instrumentation = NULL_INSTRUMENTATION
+
+
+def get_instrumentation():
+    """
+    :return: the current Instrumentation
+    """
+    return _instrumentation
+
+
+def set_instrumentation(instrumentation):
+    """
+    Set the Instrumentation used by all the verifications of the process
+    :param instrumentation: Instrumentation; None to disable the instrumentation
+    """
+    global _instrumentation
+    _instrumentation = instrumentation or NULL_INSTRUMENTATION
+
+
+class StatsdInstrumentation(Instrumentation):
+    """
+    Report to a statsd-style client with timing(name, milliseconds) and incr(name) methods, e.g. statsd.StatsClient.
+    Rejections are counted as "<prefix>.rejected.<reason>".
+    """
+
+    def __init__(self, client, prefix="cognitoauth"):
+        self.client = client
+        self.prefix = prefix
+
+    def timing(self, stage, seconds):
+        self.client.timing("{}.{}".format(self.prefix, stage), seconds * 1000.0)
+
+    def count(self, event, reason=None):
+        if reason is None:
+            self.client.incr("{}.{}".format(self.prefix, event))
+        else:
+            self.client.incr("{}.{}.{}".format(self.prefix, event, reason))
+
+
+class PrometheusInstrumentation(Instrumentation):
+    """
+    Report to a Prometheus-style histogram labelled by stage and counter labelled by event and reason.
+    Both are created with prometheus_client if not given.
+    """
+
+    def __init__(self, histogram=None, counter=None, namespace="cognitoauth"):
+        if histogram is None or counter is None:
+            import prometheus_client
+            histogram = histogram or prometheus_client.Histogram(
+                "stage_duration_seconds", "Duration of the token verification stages", ["stage"],
+                namespace=namespace,
+                buckets=(.00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .1, 1, 10),
+            )
+            counter = counter or prometheus_client.Counter(
+                "events", "Token verification events", ["event", "reason"], namespace=namespace,
+            )
+        self.histogram = histogram
+        self.counter = counter
+
+    def timing(self, stage, seconds):
+        self.histogram.labels(stage).observe(seconds)
+
+    def count(self, event, reason=None):
+        self.counter.labels(event, reason or "").inc()
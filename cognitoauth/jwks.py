@@ -0,0 +1,96 @@
+import logging
+
+from cognitoauth.backends import get_backend
+
+log = logging.getLogger(__name__)
+
+
+# Cognito User Pools sign the tokens with RS256 only
+ALLOWED_ALGORITHMS = ("RS256",)
+
+
+class JwkSet(object):
+    """
+    JSON Web Keys of a User Pool indexed by kid, with the public keys constructed up front so that
+    looking up the key of a token is a dict lookup and no key is built on the request path.
+
+    userpool_keys = JwkSet(cognito_userpool_keys(userpool_iss))
+    """
+
+    def __init__(self, keys, backend=None):
+        """
+        :param keys: json with JSON Web Keys, as returned by cognito_userpool_keys
+        :param backend: optional crypto backend building the keys; cognitoauth.backends.get_backend() by default
+        """
+        backend = backend or get_backend()
+        self._jwks = {}
+        self._verifiers = {}
+
+        duplicated_kids = set()
+        for key in keys or []:
+            kid = key.get("kid")
+            if kid in self._jwks:
+                duplicated_kids.add(kid)
+            self._jwks[kid] = key
+
+        for kid, key in list(self._jwks.items()):
+            if kid is None or kid in duplicated_kids:
+                # A token cannot tell which of these keys it was signed with
+                log.warning("Ignoring JSON Web Key with missing or duplicated kid: {}".format(kid))
+                del self._jwks[kid]
+                continue
+            alg = key.get("alg", ALLOWED_ALGORITHMS[0])
+            if alg not in ALLOWED_ALGORITHMS:
+                log.warning("Ignoring JSON Web Key {} with algorithm {}".format(kid, alg))
+                del self._jwks[kid]
+                continue
+            try:
+                self._verifiers[kid] = (alg, backend.load_key(key, alg))
+            except Exception as e:
+                log.warning("Ignoring invalid JSON Web Key {}: {}".format(kid, e))
+                del self._jwks[kid]
+
+    def __contains__(self, kid):
+        return self.get_key(kid) is not None
+
+    def __len__(self):
+        return len(self._verifiers)
+
+    def __repr__(self):
+        return "JwkSet(kids={})".format(self.kids)
+
+    def __reduce__(self):
+        # The constructed keys may not be picklable: rebuild them from the JSON Web Keys, with the default backend
+        return JwkSet, (self.keys,)
+
+    @property
+    def kids(self):
+        """List of the kids of the keys in the set"""
+        return list(self._verifiers)
+
+    @property
+    def keys(self):
+        """List of the JSON Web Keys in the set"""
+        return list(self._jwks.values())
+
+    def get_jwk(self, kid):
+        """
+        :param kid: string with the kid of the key
+        :return: dict with the JSON Web Key; None if not found
+        """
+        try:
+            return self._jwks.get(kid)
+        except TypeError:
+            # Unhashable kid of an unverified token header
+            return None
+
+    def get_key(self, kid):
+        """
+        :param kid: string with the kid of the key
+        :return: tuple (alg, key) where key has a verify(signing_input, signature) method; None if not found
+        """
+        try:
+            return self._verifiers.get(kid)
+        except TypeError:
+            # Unhashable kid of an unverified token header
+            return None
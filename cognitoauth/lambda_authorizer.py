@@ -0,0 +1,213 @@
+"""
+AWS Lambda custom authorizer, optimised for cold starts.
+
+Importing this module loads neither python-jose nor requests. The keys, the token cache and the issuer are kept in
+module-level state across the invocations of a warm container. On a cold start the keys are loaded from the
+/tmp snapshot of a previous container, or from a snapshot bundled with the function, so that the first request
+does not download the JWT Set unless the snapshots are missing or stale. Bundled snapshots should be written with
+save_snapshot, which records when the keys were downloaded; the keys of a snapshot without that time are used for
+the first request and downloaded again in the background, as the age of a file unpacked from a zip is unknown.
+
+The policy allows the whole stage of the API (arn:...:api-id/stage/*), so that a response cached by API Gateway
+for the token is valid for the other methods and paths of the API.
+
+save_snapshot("jwks.json", cognito_userpool_keys(cognito_userpool_iss(cognito_region, cognito_userpool_id)))
+
+Handler: cognitoauth.lambda_authorizer.handler, configured with the environment variables
+    COGNITO_REGION: region of the Cognito User Pool
+    COGNITO_USER_POOL_ID: ID of the Cognito User Pool
+    COGNITO_JWKS_PATH: optional path of a jwks.json snapshot bundled with the function
+    COGNITO_JWKS_CACHE_PATH: path of the snapshot persisted in /tmp; /tmp/cognitoauth-jwks.json by default
+    COGNITO_JWKS_MAX_AGE: seconds after which a snapshot is stale; 86400 by default
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from cognitoauth.cache import TokenCache
+from cognitoauth.provider import JwksProvider
+from cognitoauth.reasons import FailureReason
+from cognitoauth.token_verification import cognito_userpool_iss, header_token, verify_token_result
+
+log = logging.getLogger(__name__)
+
+DEFAULT_JWKS_CACHE_PATH = "/tmp/cognitoauth-jwks.json"
+DEFAULT_JWKS_MAX_AGE = 86400
+
+_state = None
+
+
+class AuthorizerState(object):
+    """
+    State of a warm Lambda container
+    """
+
+    def __init__(self, userpool_iss, userpool_keys, token_cache, jwks_cache_path):
+        self.userpool_iss = userpool_iss
+        self.userpool_keys = userpool_keys
+        self.token_cache = token_cache
+        self.jwks_cache_path = jwks_cache_path
+        self.persisted_generation = 0
+
+
+def load_snapshot(path, max_age, now=None):
+    """
+    Load a jwks.json snapshot
+    :param path: string with the path of the snapshot
+    :param max_age: seconds after which the snapshot is stale
+    :param now: optional current epoch time in seconds
+    :return: tuple (keys, fresh); fresh is None if the snapshot does not record when it was downloaded;
+        (None, False) if the snapshot cannot be loaded
+    """
+    if not path:
+        return None, False
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+        keys = snapshot["keys"]
+        # Snapshots written by save_snapshot record when they were downloaded; the mtime of others is meaningless
+        fetched_at = snapshot.get("fetched_at")
+    except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        log.debug("Cannot load JWT set snapshot {}: {}".format(path, e))
+        return None, False
+    if isinstance(fetched_at, bool) or not isinstance(fetched_at, (int, float)) or \
+            isinstance(fetched_at, float) and not math.isfinite(fetched_at):
+        # Undated, or dated in another format
+        return keys, None
+    # Compared rather than subtracted, as huge ints do not convert to float
+    return keys, fetched_at >= (time.time() if now is None else now) - max_age
+
+
+def save_snapshot(path, keys, now=None):
+    """
+    Persist the keys as a jwks.json snapshot, atomically
+    :param path: string with the path of the snapshot
+    :param keys: json with JSON Web Keys
+    :param now: optional current epoch time in seconds
+    :return: True if saved; False otherwise
+    """
+    tmp_path = "{}.{}".format(path, os.getpid())
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"keys": keys, "fetched_at": time.time() if now is None else now}, f)
+        os.replace(tmp_path, path)
+        return True
+    except (IOError, OSError) as e:
+        log.warning("Cannot save JWT set snapshot {}: {}".format(path, e))
+        return False
+
+
+def warm_state(environ=None):
+    """
+    Return the state of the container, created on the first invocation
+    :param environ: optional dict of environment variables; os.environ by default
+    :return: AuthorizerState
+    """
+    global _state
+    if _state is None:
+        _state = create_state(os.environ if environ is None else environ)
+    return _state
+
+
+def create_state(environ):
+    """
+    Create the state of a cold container, preferring fresh snapshots to a download
+    :param environ: dict of environment variables
+    :return: AuthorizerState
+    """
+    userpool_iss = cognito_userpool_iss(environ["COGNITO_REGION"], environ["COGNITO_USER_POOL_ID"])
+    jwks_cache_path = environ.get("COGNITO_JWKS_CACHE_PATH", DEFAULT_JWKS_CACHE_PATH)
+    max_age = float(environ.get("COGNITO_JWKS_MAX_AGE", DEFAULT_JWKS_MAX_AGE))
+
+    stale_keys = None
+    for path in [jwks_cache_path, environ.get("COGNITO_JWKS_PATH")]:
+        keys, fresh = load_snapshot(path, max_age)
+        if keys is not None and fresh is not False:
+            log.debug("Loaded JWT set snapshot {}".format(path))
+            break
+        stale_keys = stale_keys or keys
+    else:
+        keys, fresh = None, False
+
+    # No periodic refresh: the threads of a Lambda container are frozen between invocations
+    provider = JwksProvider(userpool_iss, keys=keys or stale_keys)
+    state = AuthorizerState(userpool_iss, provider, TokenCache(), jwks_cache_path)
+    if keys is None:
+        # Snapshots missing or stale: download now, keeping the stale keys if the download fails
+        provider.refresh()
+        persist_keys(state)
+    elif fresh is None:
+        # Snapshot of unknown age: serve its keys and download them again while the container runs
+        threading.Thread(target=provider.refresh, name="JwksProvider", daemon=True).start()
+    return state
+
+
+def persist_keys(state):
+    """
+    Persist the keys of the provider to /tmp if they were downloaded since the last call
+    :param state: AuthorizerState
+    """
+    provider = state.userpool_keys
+    if provider.generation != state.persisted_generation:
+        state.persisted_generation = provider.generation
+        save_snapshot(state.jwks_cache_path, provider.key_set.keys)
+
+
+def stage_arn(arn):
+    """
+    :param arn: string with the ARN of a method or route, arn:aws:execute-api:region:account:api-id/stage/VERB/path
+    :return: string with the ARN of all the methods and routes of its stage, arn:...:api-id/stage/*
+    """
+    parts = (arn or "").split("/", 2)
+    if len(parts) < 3:
+        return arn
+    return "{}/{}/*".format(parts[0], parts[1])
+
+
+def handler(event, context):
+    """
+    Lambda custom authorizer handler, for TOKEN and REQUEST authorizers
+    :param event: dict with the authorizer event
+    :param context: Lambda context
+    :return: dict with the IAM policy allowing the request
+    """
+    state = warm_state()
+
+    authorization = event.get("authorizationToken")
+    if authorization is None:
+        headers = event.get("headers") or {}
+        authorization = headers.get("Authorization") or headers.get("authorization")
+
+    token = header_token(authorization)
+    if token is None:
+        raise Exception("Unauthorized")
+
+    result = verify_token_result(token, state.userpool_iss, state.userpool_keys, state.token_cache)
+    # A rotation may have downloaded new keys
+    persist_keys(state)
+    if not result or result.username is None:
+        log.info("Unauthorized request: %s", (result.reason or FailureReason.MISSING_USERNAME).value)
+        # API Gateway answers 401 for this exact message
+        raise Exception("Unauthorized")
+    username, claims = result.username, result.claims
+
+    return {
+        "principalId": username,
+        "policyDocument": {
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": "execute-api:Invoke",
+                "Effect": "Allow",
+                # API Gateway may cache the policy for the token and use it for other methods and paths
+                "Resource": stage_arn(event.get("methodArn") or event.get("routeArn")),
+            }],
+        },
+        "context": {
+            "username": username,
+            "sub": claims.get("sub"),
+            "token_use": claims.get("token_use"),
+        },
+    }
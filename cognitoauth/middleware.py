@@ -0,0 +1,204 @@
+"""
+WSGI and ASGI middleware authorising the requests with their Cognito token.
+
+The keys and the token cache are created once per worker process, on its first request, so that pre-fork servers
+do not share the background refresh thread of the master process. Verified requests get the username and the
+claims of the token in environ["cognitoauth.username"] and environ["cognitoauth.claims"] (or the same keys of the
+ASGI scope); the others get a 401 response, without any exception raised on the way.
+
+app = CognitoAuthWSGIMiddleware(app, cognito_region, cognito_userpool_id)
+"""
+import json
+import logging
+import os
+import threading
+
+from cognitoauth import instrumentation
+from cognitoauth.aio import verify_token_result_async
+from cognitoauth.cache import TokenCache
+from cognitoauth.provider import JwksProvider
+from cognitoauth.reasons import FailureReason
+from cognitoauth.result import VerificationResult
+from cognitoauth.token_verification import cognito_userpool_iss, header_token, verify_token_result
+
+log = logging.getLogger(__name__)
+
+USERNAME_KEY = "cognitoauth.username"
+CLAIMS_KEY = "cognitoauth.claims"
+
+UNAUTHORIZED_BODY = json.dumps({"message": "Unauthorized"}).encode("utf-8")
+UNAUTHORIZED_HEADERS = [
+    ("Content-Type", "application/json"),
+    ("Content-Length", str(len(UNAUTHORIZED_BODY))),
+    ("WWW-Authenticate", 'Bearer error="invalid_token"'),
+]
+
+
+def default_keys_factory(userpool_iss):
+    """
+    :param userpool_iss: string with Cognito User Pool ISS
+    :return: JwksProvider refreshing the keys in the background
+    """
+    return JwksProvider(userpool_iss).start()
+
+
+class _WorkerState(object):
+    """
+    Keys and token cache of the current worker process
+    """
+
+    def __init__(self, userpool_keys, token_cache, revocation_list=None):
+        self.pid = os.getpid()
+        self.userpool_keys = userpool_keys
+        self.token_cache = token_cache
+        self.revocation_list = revocation_list
+
+
+class _CognitoAuth(object):
+    """
+    Configuration and per-worker state shared by the WSGI and ASGI middleware
+    """
+
+    def __init__(self, app, cognito_region, cognito_userpool_id, keys_factory=default_keys_factory,
+                 token_cache_factory=TokenCache, exempt_paths=(), revocation_list_factory=None):
+        """
+        :param app: WSGI or ASGI application
+        :param cognito_region: string with region for Cognito User Pool
+        :param cognito_userpool_id: string with Cognito User Pool ID
+        :param keys_factory: function returning the keys of the User Pool given its issuer, called once per worker
+        :param token_cache_factory: function returning the token cache, called once per worker; None for no cache
+        :param exempt_paths: paths served without authorisation, e.g. health checks
+        :param revocation_list_factory: optional function returning the started RevocationList, called once per
+            worker
+        """
+        self.app = app
+        self.userpool_iss = cognito_userpool_iss(cognito_region, cognito_userpool_id)
+        self.keys_factory = keys_factory
+        self.token_cache_factory = token_cache_factory
+        self.exempt_paths = frozenset(exempt_paths)
+        self.revocation_list_factory = revocation_list_factory
+        self._state = None
+        self._lock = threading.Lock()
+
+    def worker_state(self):
+        """
+        :return: _WorkerState of the current process, created on its first call in the process
+        """
+        state = self._state
+        if state is None or state.pid != os.getpid():
+            with self._lock:
+                state = self._state
+                if state is None or state.pid != os.getpid():
+                    token_cache = self.token_cache_factory() if self.token_cache_factory else None
+                    revocation_list = self.revocation_list_factory() if self.revocation_list_factory else None
+                    state = _WorkerState(self.keys_factory(self.userpool_iss), token_cache, revocation_list)
+                    self._state = state
+        return state
+
+    @staticmethod
+    def _rejected(reason):
+        instrumentation.get_instrumentation().count("rejected", reason.value)
+        return VerificationResult.rejected(reason)
+
+
+class CognitoAuthWSGIMiddleware(_CognitoAuth):
+    """
+    WSGI middleware authorising the requests with their Cognito token
+    """
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") in self.exempt_paths:
+            return self.app(environ, start_response)
+
+        result = self.verify(environ.get("HTTP_AUTHORIZATION"))
+        if not result:
+            log.debug("Unauthorized request: %s", result.reason.value)
+            start_response("401 Unauthorized", list(UNAUTHORIZED_HEADERS))
+            return [UNAUTHORIZED_BODY]
+
+        environ[USERNAME_KEY] = result.username
+        environ[CLAIMS_KEY] = result.claims
+        return self.app(environ, start_response)
+
+    def verify(self, authorization):
+        """
+        :param authorization: string with the value of the Authorization header; None if missing
+        :return: VerificationResult as returned by verify_token_result
+        """
+        token = header_token(authorization)
+        if token is None:
+            return self._rejected(FailureReason.NO_TOKEN)
+        state = self.worker_state()
+        result = verify_token_result(token, self.userpool_iss, state.userpool_keys, state.token_cache,
+                                     revocation_list=state.revocation_list)
+        if result and result.username is None:
+            return self._rejected(FailureReason.MISSING_USERNAME)
+        return result
+
+
+class CognitoAuthASGIMiddleware(_CognitoAuth):
+    """
+    ASGI middleware authorising the http and websocket connections with their Cognito token.
+    The signature checks run in the executor of cognitoauth.aio.
+    """
+
+    def __init__(self, app, cognito_region, cognito_userpool_id, executor=None, **kwargs):
+        """
+        :param executor: optional executor running the signature checks; see cognitoauth.aio.verify_token_async
+        :param kwargs: keyword arguments of CognitoAuthWSGIMiddleware
+        """
+        super(CognitoAuthASGIMiddleware, self).__init__(app, cognito_region, cognito_userpool_id, **kwargs)
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or scope.get("path") in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        result = await self.verify(_asgi_authorization(scope))
+        if not result:
+            log.debug("Unauthorized request: %s", result.reason.value)
+            if scope["type"] == "websocket":
+                # Policy violation, before the connection is accepted
+                await send({"type": "websocket.close", "code": 1008})
+            else:
+                await send({
+                    "type": "http.response.start",
+                    "status": 401,
+                    "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                for name, value in UNAUTHORIZED_HEADERS],
+                })
+                await send({"type": "http.response.body", "body": UNAUTHORIZED_BODY})
+            return
+
+        scope = dict(scope)
+        scope[USERNAME_KEY] = result.username
+        scope[CLAIMS_KEY] = result.claims
+        await self.app(scope, receive, send)
+
+    async def verify(self, authorization):
+        """
+        :param authorization: string with the value of the Authorization header; None if missing
+        :return: VerificationResult as returned by verify_token_result
+        """
+        token = header_token(authorization)
+        if token is None:
+            return self._rejected(FailureReason.NO_TOKEN)
+        state = self.worker_state()
+        result = await verify_token_result_async(
+            token, self.userpool_iss, state.userpool_keys, state.token_cache, self.executor, state.revocation_list
+        )
+        if result and result.username is None:
+            return self._rejected(FailureReason.MISSING_USERNAME)
+        return result
+
+
+def _asgi_authorization(scope):
+    """
+    :param scope: ASGI connection scope
+    :return: string with the value of the Authorization header; None if missing
+    """
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            return value.decode("latin-1")
+    return None
@@ -0,0 +1,124 @@
+import threading
+
+from cognitoauth import instrumentation
+from cognitoauth.provider import JwksProvider
+from cognitoauth.reasons import FailureReason, format_message
+from cognitoauth.token_verification import (
+    _cached_token, _decode_token, _verify_token, cognito_userpool_iss, retrieve_header_token
+)
+
+
+class MultiPoolVerifier(object):
+    """
+    Verify tokens of many Cognito User Pools, e.g. one per tenant.
+
+    The issuer of the token routes it to the keys of its User Pool through a dict, so the cost per request does not
+    depend on the number of User Pools. The keys of a User Pool are loaded on first use.
+
+    verifier = MultiPoolVerifier()
+    verifier.register(cognito_region, cognito_userpool_id)
+    username = verifier.authorise_request(request)
+    """
+
+    def __init__(self, token_cache=None, keys_factory=JwksProvider, revocation_list=None):
+        """
+        :param token_cache: optional TokenCache shared by all the User Pools
+        :param keys_factory: function returning the keys of a User Pool given its issuer; JwksProvider by default
+        :param revocation_list: optional RevocationList shared by all the User Pools
+        """
+        self.token_cache = token_cache
+        self.revocation_list = revocation_list
+        self._keys_factory = keys_factory
+        self._userpool_keys = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, userpool_iss):
+        return userpool_iss in self._userpool_keys
+
+    def __len__(self):
+        return len(self._userpool_keys)
+
+    @property
+    def issuers(self):
+        """List of the issuers of the registered User Pools"""
+        return list(self._userpool_keys)
+
+    def register(self, cognito_region, cognito_userpool_id, userpool_keys=None):
+        """
+        Register a User Pool
+        :param cognito_region: string with region for Cognito User Pool
+        :param cognito_userpool_id: string with Cognito User Pool ID
+        :param userpool_keys: optional JwksProvider, JwkSet, or JSON Web Keys; loaded on first use if not given
+        :return: string with iss of the Cognito User Pool
+        """
+        userpool_iss = cognito_userpool_iss(cognito_region, cognito_userpool_id)
+        with self._lock:
+            self._userpool_keys[userpool_iss] = userpool_keys
+        return userpool_iss
+
+    def unregister(self, userpool_iss):
+        """
+        Unregister a User Pool
+        :param userpool_iss: string with iss of the Cognito User Pool
+        """
+        with self._lock:
+            self._userpool_keys.pop(userpool_iss, None)
+
+    def userpool_keys(self, userpool_iss):
+        """
+        Return the keys of a registered User Pool, loading them on first use
+        :param userpool_iss: string with iss of the Cognito User Pool
+        :return: keys of the User Pool; None if the User Pool is not registered
+        """
+        userpool_keys = self._userpool_keys.get(userpool_iss)
+        if userpool_keys is None:
+            with self._lock:
+                if userpool_iss not in self._userpool_keys:
+                    return None
+                userpool_keys = self._userpool_keys[userpool_iss]
+                if userpool_keys is None:
+                    userpool_keys = self._keys_factory(userpool_iss)
+                    self._userpool_keys[userpool_iss] = userpool_keys
+        return userpool_keys
+
+    def verify_token(self, token):
+        """
+        Verify a token of any of the registered User Pools
+        :param token: jwt string
+        :return: tuple (claims, username, err_msg) as returned by verify_token
+        """
+        if self.token_cache is not None:
+            # The User Pool may have been unregistered since the token was cached
+            cached = _cached_token(token, None, self.token_cache, self.revocation_list, issuers=self._userpool_keys)
+            if cached is not None:
+                return cached
+
+        try:
+            decoded = _decode_token(token)
+            userpool_iss = decoded[1].get("iss")
+        except Exception:
+            # Let verify_token report why the token cannot be decoded
+            return _verify_token(token, None, None, None)
+
+        userpool_keys = self.userpool_keys(userpool_iss) if isinstance(userpool_iss, str) else None
+        if userpool_keys is None:
+            instrumentation.get_instrumentation().count("rejected", FailureReason.INVALID_ISSUER.value)
+            return None, None, format_message(FailureReason.INVALID_ISSUER)
+        return _verify_token(token, userpool_iss, userpool_keys, self.token_cache, decoded,
+                             revocation_list=self.revocation_list)
+
+    def authorise_request(self, request):
+        """
+        :param request: request with the token in its Authorization header
+        :return: username
+        """
+        token = retrieve_header_token(request)
+
+        claims, username, err_msg = self.verify_token(token)
+        if err_msg is not None:
+            raise Exception("Token validation failed: {}".format(err_msg))
+        if username is None:
+            instrumentation.get_instrumentation().count("rejected", FailureReason.MISSING_USERNAME.value)
+            raise Exception(format_message(FailureReason.MISSING_USERNAME))
+
+        return username
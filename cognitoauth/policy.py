@@ -0,0 +1,154 @@
+"""
+Authorization policies of routes, checked against the claims of verified tokens.
+
+The requirements of the routes are compiled once: each scope and group is given a bit, so that checking a request
+is a dict lookup and a few integer operations, whatever the number of routes and scopes. The masks of the scope
+and group claims are memoised, as most tokens share a few combinations.
+
+policies = PolicySet({
+    "GET /orders": {"scopes": ["orders/read"]},
+    "POST /orders": {"scopes": ["orders/write"], "groups": ["staff", "admin"]},
+})
+result = authorise_request_result(request, cognito_region, cognito_userpool_id, userpool_keys)
+if result and policies.allows("GET /orders", result.claims):
+    ...
+"""
+from enum import Enum
+import threading
+
+
+class PolicyDenial(Enum):
+    """
+    Stable codes of the reasons a policy denies a verified token
+    """
+    UNKNOWN_ROUTE = "unknown_route"
+    TOKEN_USE_NOT_ALLOWED = "token_use_not_allowed"
+    CLIENT_NOT_ALLOWED = "client_not_allowed"
+    INSUFFICIENT_SCOPE = "insufficient_scope"
+    GROUP_NOT_ALLOWED = "group_not_allowed"
+
+
+class Requirement(object):
+    """
+    Requirement of a route: all of its scopes, any of its groups, any of its clients and any of its token uses
+    """
+    __slots__ = ("scopes", "groups", "client_ids", "token_uses")
+
+    def __init__(self, scopes=(), groups=(), client_ids=(), token_uses=()):
+        """
+        :param scopes: scopes all required in the scope claim of the access token
+        :param groups: groups of which at least one is required in the cognito:groups claim; any group if empty
+        :param client_ids: app client ids allowed in the client_id (access token) or aud (id token) claim; any if
+            empty
+        :param token_uses: token uses allowed, "access" and/or "id"; any if empty
+        """
+        self.scopes = frozenset(scopes)
+        self.groups = frozenset(groups)
+        self.client_ids = frozenset(client_ids)
+        self.token_uses = frozenset(token_uses)
+
+
+class _CompiledRequirement(object):
+    __slots__ = ("scope_mask", "group_mask", "client_ids", "token_uses")
+
+    def __init__(self, scope_mask, group_mask, client_ids, token_uses):
+        self.scope_mask = scope_mask
+        self.group_mask = group_mask
+        self.client_ids = client_ids
+        self.token_uses = token_uses
+
+
+class PolicySet(object):
+    """
+    Requirements of routes compiled into bitmasks
+    """
+
+    def __init__(self, rules, max_cached_masks=4096):
+        """
+        :param rules: dict of Requirement, or of dict with the keyword arguments of Requirement, by route; a route
+            is any hashable value, e.g. "GET /orders"
+        :param max_cached_masks: maximum number of memoised scope and group claim masks
+        """
+        self.max_cached_masks = max_cached_masks
+        self._scope_bits = {}
+        self._group_bits = {}
+        self._routes = {}
+        for route, requirement in rules.items():
+            if not isinstance(requirement, Requirement):
+                requirement = Requirement(**requirement)
+            self._routes[route] = _CompiledRequirement(
+                self._mask(requirement.scopes, self._scope_bits, add=True),
+                self._mask(requirement.groups, self._group_bits, add=True),
+                requirement.client_ids or None,
+                requirement.token_uses or None,
+            )
+        self._scope_masks = {}
+        self._group_masks = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, route):
+        return route in self._routes
+
+    def __len__(self):
+        return len(self._routes)
+
+    def check(self, route, claims):
+        """
+        :param route: route of the request
+        :param claims: dict with the verified claims of the token
+        :return: PolicyDenial if the route is not allowed; None if allowed
+        """
+        requirement = self._routes.get(route)
+        if requirement is None:
+            return PolicyDenial.UNKNOWN_ROUTE
+        if requirement.token_uses is not None and claims.get("token_use") not in requirement.token_uses:
+            return PolicyDenial.TOKEN_USE_NOT_ALLOWED
+        if requirement.client_ids is not None and \
+                claims.get("client_id", claims.get("aud")) not in requirement.client_ids:
+            return PolicyDenial.CLIENT_NOT_ALLOWED
+        if requirement.scope_mask:
+            scope_mask = self._claim_mask(claims.get("scope"), self._scope_masks, self._scope_bits)
+            if scope_mask & requirement.scope_mask != requirement.scope_mask:
+                return PolicyDenial.INSUFFICIENT_SCOPE
+        if requirement.group_mask:
+            group_mask = self._claim_mask(claims.get("cognito:groups"), self._group_masks, self._group_bits)
+            if not group_mask & requirement.group_mask:
+                return PolicyDenial.GROUP_NOT_ALLOWED
+        return None
+
+    def allows(self, route, claims):
+        """
+        :param route: route of the request
+        :param claims: dict with the verified claims of the token
+        :return: True if the route is allowed; False otherwise
+        """
+        return self.check(route, claims) is None
+
+    @staticmethod
+    def _mask(names, bits, add=False):
+        mask = 0
+        for name in names:
+            bit = bits.get(name)
+            if bit is None:
+                if not add:
+                    # Not required by any route
+                    continue
+                bit = bits[name] = 1 << len(bits)
+            mask |= bit
+        return mask
+
+    def _claim_mask(self, claim, masks, bits):
+        # Scopes are a space separated string, groups a list
+        if isinstance(claim, list):
+            key = tuple(claim)
+        else:
+            key = claim if isinstance(claim, str) else None
+        mask = masks.get(key)
+        if mask is None:
+            names = key.split() if isinstance(key, str) else key or ()
+            mask = self._mask(names, bits)
+            with self._lock:
+                if len(masks) >= self.max_cached_masks:
+                    masks.clear()
+                masks[key] = mask
+        return mask
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+
+from cognitoauth.jwks import JwkSet
+from cognitoauth.token_verification import DEFAULT_TIMEOUT, cognito_userpool_keys
+
+log = logging.getLogger(__name__)
+
+
+def pooled_session(pool_maxsize=4, max_retries=2):
+    """
+    Return a requests.Session reusing its connections to the JWT Set endpoint
+    :param pool_maxsize: maximum number of connections kept per host
+    :param max_retries: number of retries on connection errors
+    :return: requests.Session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=max_retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class JwksProvider(object):
+    """
+    JSON Web Keys of a User Pool held in memory and refreshed when Cognito rotates its keys.
+
+    The keys are downloaded on first use, and refreshed every refresh_interval seconds by a background thread once
+    start() is called. A token signed with an unknown kid triggers at most one refetch, shared by all the
+    concurrent callers and no more often than every min_refetch_interval seconds.
+
+    userpool_keys = JwksProvider(cognito_userpool_iss(cognito_region, cognito_userpool_id)).start()
+    username = authorise_request(request, cognito_region, cognito_userpool_id, userpool_keys)
+    """
+
+    def __init__(self, userpool_iss, keys=None, refresh_interval=3600, min_refetch_interval=30,
+                 timeout=DEFAULT_TIMEOUT, session=None, timer=time.monotonic):
+        """
+        :param userpool_iss: string with Cognito User Pool ISS
+        :param keys: optional json with JSON Web Keys to start with, e.g. from a snapshot
+        :param refresh_interval: seconds between two background refreshes
+        :param min_refetch_interval: minimum seconds between two downloads triggered by unknown kids
+        :param timeout: (connect, read) timeouts in seconds
+        :param session: optional requests.Session; a pooled session is created by default
+        :param timer: monotonic clock in seconds
+        """
+        self.userpool_iss = userpool_iss
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self._session = session
+        self._timer = timer
+        self._key_set = JwkSet(keys)
+        self._fetch_lock = threading.Lock()
+        self._generation = 0
+        self._last_attempt = None
+        self._stopped = threading.Event()
+        self._thread = None
+        self.fetch_count = 0
+        self.fetch_failures = 0
+
+    def __contains__(self, kid):
+        return kid in self._key_set
+
+    def __len__(self):
+        return len(self._key_set)
+
+    @property
+    def key_set(self):
+        """Current JwkSet of the User Pool"""
+        return self._key_set
+
+    @property
+    def generation(self):
+        """Number of successful downloads of the keys"""
+        return self._generation
+
+    @property
+    def kids(self):
+        """List of the kids of the current keys"""
+        return self._key_set.kids
+
+    def get_jwk(self, kid):
+        """
+        :param kid: string with the kid of the key
+        :return: dict with the JSON Web Key; None if not found
+        """
+        return self._key_set.get_jwk(kid)
+
+    def get_key(self, kid):
+        """
+        Return the key of the given kid, refetching the keys once if the kid is unknown
+        :param kid: string with the kid of the key
+        :return: tuple (alg, key) as returned by JwkSet.get_key; None if not found
+        """
+        key = self._key_set.get_key(kid)
+        if key is None:
+            self._refetch()
+            key = self._key_set.get_key(kid)
+        return key
+
+    def refresh(self):
+        """
+        Download the keys now
+        :return: True if the keys were downloaded; False otherwise
+        """
+        with self._fetch_lock:
+            return self._fetch()
+
+    def start(self):
+        """
+        Start refreshing the keys in a background thread
+        :return: self
+        """
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="JwksProvider", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop refreshing the keys in the background"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        if not len(self._key_set):
+            self.refresh()
+        while not self._stopped.wait(self.refresh_interval):
+            self.refresh()
+
+    def _refetch(self):
+        generation = self._generation
+        with self._fetch_lock:
+            if self._generation != generation:
+                # Another caller downloaded the keys while this one was waiting
+                return
+            if self._last_attempt is not None and \
+                    self._timer() - self._last_attempt < self.min_refetch_interval:
+                return
+            self._fetch()
+
+    def _fetch(self):
+        # Must be called with _fetch_lock held
+        self._last_attempt = self._timer()
+        self.fetch_count += 1
+        if self._session is None:
+            # Created on first download, so that keys loaded from a snapshot do not need requests
+            self._session = pooled_session()
+        keys = cognito_userpool_keys(self.userpool_iss, session=self._session, timeout=self.timeout)
+        if keys is None:
+            # Keep serving the keys we have
+            self.fetch_failures += 1
+            return False
+        self._key_set = JwkSet(keys)
+        self._generation += 1
+        log.debug("Downloaded JSON Web Keys {}".format(self._key_set.kids))
+        return True
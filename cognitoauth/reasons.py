@@ -0,0 +1,60 @@
+from enum import Enum
+
+
+class FailureReason(Enum):
+    """
+    Stable codes of the reasons a token is rejected, e.g. for metrics; the error messages may change
+    """
+    NO_TOKEN = "no_token"
+    MALFORMED = "malformed"
+    ALGORITHM_NOT_ALLOWED = "algorithm_not_allowed"
+    INVALID_ISSUER = "invalid_issuer"
+    INVALID_TOKEN_USE = "invalid_token_use"
+    INVALID_EXPIRY = "invalid_expiry"
+    EXPIRED = "expired"
+    NOT_YET_VALID = "not_yet_valid"
+    UNKNOWN_KID = "unknown_kid"
+    INVALID_SIGNATURE = "invalid_signature"
+    MISSING_USERNAME = "missing_username"
+    REVOKED = "revoked"
+
+
+def format_message(reason, detail=None):
+    """
+    Format the error message of a rejected token
+    :param reason: FailureReason
+    :param detail: optional detail of the failure; seconds since the token expired for FailureReason.EXPIRED, and
+        until it is valid for FailureReason.NOT_YET_VALID
+    :return: string with the error message
+    """
+    if reason is FailureReason.MALFORMED:
+        return "Failed to decode token: {}".format(detail)
+    if reason is FailureReason.ALGORITHM_NOT_ALLOWED:
+        return "Failed to verify signature: algorithm {} is not allowed".format(detail)
+    if reason is FailureReason.EXPIRED or reason is FailureReason.NOT_YET_VALID:
+        import datetime
+        try:
+            delay = datetime.timedelta(seconds=detail)
+        except (TypeError, ValueError, OverflowError):
+            # No detail, or a time no timedelta can hold
+            return _MESSAGES[reason]
+        if reason is FailureReason.EXPIRED:
+            return "Token has expired {}".format(delay)
+        return "Token is not valid until {} later".format(delay)
+    if reason is FailureReason.INVALID_SIGNATURE and detail is not None:
+        return "Failed to verify signature {}".format(detail)
+    return _MESSAGES[reason]
+
+
+_MESSAGES = {
+    FailureReason.NO_TOKEN: "No token found in header",
+    FailureReason.INVALID_ISSUER: "Invalid issuer in token",
+    FailureReason.INVALID_TOKEN_USE: "Token not of valid use",
+    FailureReason.INVALID_EXPIRY: "Token has no valid expiry",
+    FailureReason.EXPIRED: "Token has expired",
+    FailureReason.NOT_YET_VALID: "Token is not valid yet",
+    FailureReason.UNKNOWN_KID: "Obtained keys are wrong",
+    FailureReason.INVALID_SIGNATURE: "Failed to verify signature",
+    FailureReason.MISSING_USERNAME: "Username not found in token",
+    FailureReason.REVOKED: "Token has been revoked",
+}
@@ -0,0 +1,80 @@
+from cognitoauth.reasons import FailureReason, format_message
+
+
+class VerificationResult(object):
+    """
+    Outcome of the verification of a token, returned without raising and without formatting the error message
+    until it is read. Results are immutable; rejections without detail are shared.
+
+    result = authorise_request_result(request, cognito_region, cognito_userpool_id, userpool_keys)
+    if not result:
+        log.info("Rejected {}: {}".format(result.reason.value, result.message))
+    """
+    __slots__ = ("_claims", "_username", "_reason", "_detail")
+
+    def __init__(self, claims=None, username=None, reason=None, detail=None):
+        """
+        :param claims: dict with the verified claims of the token; None if rejected
+        :param username: string with the username of the token; None if rejected
+        :param reason: FailureReason if the token is rejected; None if verified
+        :param detail: optional detail of the failure, see format_message
+        """
+        self._claims = claims
+        self._username = username
+        self._reason = reason
+        self._detail = detail
+
+    @classmethod
+    def rejected(cls, reason, detail=None):
+        """
+        :param reason: FailureReason
+        :param detail: optional detail of the failure, see format_message
+        :return: VerificationResult of a rejected token
+        """
+        if detail is None:
+            return _REJECTIONS[reason]
+        return cls(reason=reason, detail=detail)
+
+    def __bool__(self):
+        return self._reason is None
+
+    def __repr__(self):
+        if self._reason is None:
+            return "VerificationResult(username={!r})".format(self._username)
+        return "VerificationResult(reason={})".format(self._reason)
+
+    @property
+    def ok(self):
+        """True if the token is verified"""
+        return self._reason is None
+
+    @property
+    def claims(self):
+        """Dict with the verified claims of the token; None if rejected"""
+        return self._claims
+
+    @property
+    def username(self):
+        """String with the username of the token; None if rejected or not found"""
+        return self._username
+
+    @property
+    def reason(self):
+        """FailureReason of a rejected token; None if verified"""
+        return self._reason
+
+    @property
+    def message(self):
+        """String with the error message of a rejected token, formatted on each read; None if verified"""
+        if self._reason is None:
+            return None
+        return format_message(self._reason, self._detail)
+
+    def as_tuple(self):
+        """
+        :return: tuple (claims, username, err_msg) as returned by verify_token
+        """
+        return self._claims, self._username, self.message
+
+
+_REJECTIONS = {reason: VerificationResult(reason=reason) for reason in FailureReason}
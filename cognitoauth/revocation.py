@@ -0,0 +1,216 @@
+"""
+Local denylist of revoked tokens, checked after the signature of a token is verified.
+
+Cognito tokens stay valid until they expire, even after a global sign-out or an admin revocation. A RevocationList
+holds the jti of revoked tokens and the sub of users signed out in dicts, so that checking a token is a dict lookup
+whatever the number of entries. The entries are dropped once the tokens they revoke would have expired anyway.
+
+revocation_list = RevocationList(source=FileSource("/var/lib/app/revocations.jsonl")).start()
+username = authorise_request(request, cognito_region, cognito_userpool_id, userpool_keys,
+                             revocation_list=revocation_list)
+
+The entries are dicts, e.g. JSON lines of a file:
+    {"jti": "d3c92f1c-...", "exp": 1507256126}: token of the given jti, until its exp
+    {"sub": "f1c4cf9f-...", "revoked_at": 1507252526}: tokens of the user issued up to revoked_at
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class RevocationList(object):
+    """
+    Denylist of revoked token jti and signed out user sub, updated incrementally from a source
+    """
+
+    def __init__(self, max_token_lifetime=86400, source=None, refresh_interval=60, timer=time.time):
+        """
+        :param max_token_lifetime: seconds after which the tokens of a signed out user have all expired
+        :param source: optional function returning the new entries since its previous call, e.g. a FileSource
+        :param refresh_interval: seconds between two calls to the source by the background thread
+        :param timer: function returning the current epoch time in seconds
+        """
+        self.max_token_lifetime = max_token_lifetime
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self._timer = timer
+        # jti: exp of the token; sub: (revoked_at, expiry of the entry)
+        self._jtis = {}
+        self._subs = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._jtis) + len(self._subs)
+
+    def revoke_jti(self, jti, exp):
+        """
+        Revoke the token of the given jti
+        :param jti: string with the jti claim of the token
+        :param exp: exp claim of the token, after which the entry is dropped
+        """
+        _check_time("exp", exp)
+        with self._lock:
+            self._jtis[jti] = max(exp, self._jtis.get(jti, exp))
+
+    def revoke_sub(self, sub, revoked_at=None, expires_at=None):
+        """
+        Revoke the tokens of the given user issued up to revoked_at, e.g. on global sign-out
+        :param sub: string with the sub claim of the tokens
+        :param revoked_at: epoch time in seconds of the sign-out; now by default
+        :param expires_at: epoch time in seconds after which the entry is dropped; the expiry of the last tokens
+            issued before revoked_at by default
+        """
+        revoked_at = self._timer() if revoked_at is None else _check_time("revoked_at", revoked_at)
+        expires_at = revoked_at + self.max_token_lifetime if expires_at is None else _check_time("exp", expires_at)
+        with self._lock:
+            previous = self._subs.get(sub)
+            if previous is not None:
+                revoked_at, expires_at = max(revoked_at, previous[0]), max(expires_at, previous[1])
+            self._subs[sub] = (revoked_at, expires_at)
+
+    def update(self, entries):
+        """
+        Add entries to the denylist
+        :param entries: iterable of dicts with either jti and exp, or sub and optional revoked_at and exp
+        :return: number of entries added
+        """
+        count = 0
+        for entry in entries:
+            try:
+                if isinstance(entry.get("jti"), str):
+                    self.revoke_jti(entry["jti"], entry["exp"])
+                elif isinstance(entry.get("sub"), str):
+                    self.revoke_sub(entry["sub"], entry.get("revoked_at"), entry.get("exp"))
+                else:
+                    raise ValueError("jti or sub is required")
+                count += 1
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                log.warning("Invalid revocation entry {}: {}".format(entry, e))
+        return count
+
+    def is_revoked(self, claims):
+        """
+        :param claims: dict with the verified claims of the token
+        :return: True if the token is revoked; False otherwise
+        """
+        jti = claims.get("jti")
+        if jti is not None and jti in self._jtis:
+            return True
+        revocation = self._subs.get(claims.get("sub"))
+        # Tokens issued after the sign-out are valid
+        return revocation is not None and claims.get("iat", 0) <= revocation[0]
+
+    def prune(self):
+        """
+        Drop the entries of the tokens which have expired anyway
+        :return: number of entries dropped
+        """
+        now = self._timer()
+        with self._lock:
+            jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+            subs = {sub: revocation for sub, revocation in self._subs.items() if revocation[1] > now}
+            dropped = len(self._jtis) + len(self._subs) - len(jtis) - len(subs)
+            self._jtis, self._subs = jtis, subs
+        return dropped
+
+    def refresh(self):
+        """
+        Add the new entries of the source and drop the expired ones
+        :return: number of entries added
+        """
+        count = 0
+        if self.source is not None:
+            try:
+                count = self.update(self.source())
+            except Exception as e:
+                # Keep the entries we have
+                log.error("Failed to update the revocation list: {}".format(e))
+        self.prune()
+        return count
+
+    def start(self):
+        """
+        Start refreshing the denylist in a background thread
+        :return: self
+        """
+        if self._thread is None:
+            self.refresh()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="RevocationList", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop refreshing the denylist in the background"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep applying the new revocations
+                log.error("Failed to refresh the revocation list: {}".format(e))
+
+
+def _check_time(name, value):
+    """
+    :param name: string with the name of the value, for the error message
+    :param value: epoch time in seconds
+    :return: value
+    :raise TypeError: if value is not a number
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError("{} must be an epoch time in seconds, not {!r}".format(name, value))
+    return value
+
+
+class FileSource(object):
+    """
+    Source of a RevocationList reading the lines appended to a JSON lines file since its previous call
+    """
+
+    def __init__(self, path):
+        """
+        :param path: string with the path of the JSON lines file; read again from its start if replaced or truncated
+        """
+        self.path = path
+        self._inode = None
+        self._offset = 0
+
+    def __call__(self):
+        """
+        :return: list of the entries appended since the previous call
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return []
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._inode = stat.st_ino
+            self._offset = 0
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Line being written: read it on the next call
+                    break
+                self._offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line.decode("utf-8")))
+                except ValueError as e:
+                    log.warning("Invalid revocation line in {}: {}".format(self.path, e))
+        return entries
@@ -0,0 +1,275 @@
+"""
+Cache of verified tokens shared by the worker processes of a host, e.g. the workers of a pre-fork server.
+
+The cache is a fixed-size hash table in a memory-mapped file. Each token digest is hashed to a bucket of a few
+slots; a bucket is read and written under one of a few striped locks, each held both by a thread lock and by an
+fcntl lock on one byte of the file, so that the workers of the host and their threads never see a partial entry.
+An entry is dropped once its exp has passed, and a full bucket evicts the entry expiring first.
+
+The entries are trusted without checking their signature: the cache file must only be writable by the user of the
+workers. It is kept by default in a directory private to that user, and a file owned by another user, writable by
+others, or not a regular file is refused.
+
+token_cache_factory = lambda: SharedTokenCache()
+app = CognitoAuthWSGIMiddleware(app, cognito_region, cognito_userpool_id, token_cache_factory=token_cache_factory)
+"""
+import fcntl
+import json
+import logging
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+
+from cognitoauth.cache import TokenCache
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"CGTC"
+VERSION = 1
+# magic, version, buckets, ways, slot size
+HEADER = struct.Struct("<4sIIII")
+HEADER_SIZE = mmap.PAGESIZE
+# digest, expires_at, payload length
+SLOT = struct.Struct("<32sdH")
+DEFAULT_FILENAME = "tokens"
+
+
+def default_cache_dir():
+    """
+    Directory private to the current user, created with mode 0700 if missing: in $XDG_RUNTIME_DIR, else /dev/shm,
+    else the temporary directory
+    :return: string with the path of the directory
+    """
+    parent = os.environ.get("XDG_RUNTIME_DIR")
+    if not parent or not os.path.isdir(parent):
+        parent = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    path = os.path.join(parent, "cognitoauth-{}".format(os.geteuid()))
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o077:
+        raise ValueError("{} is not a directory private to the current user".format(path))
+    return path
+
+
+def _check_private(fd, path):
+    # The entries are trusted as verified: refuse files other users could have written
+    st = os.fstat(fd)
+    if not stat.S_ISREG(st.st_mode):
+        raise ValueError("{} is not a regular file".format(path))
+    if st.st_uid != os.geteuid():
+        raise ValueError("{} is owned by another user".format(path))
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ValueError("{} is writable by other users".format(path))
+
+
+class SharedTokenCache(object):
+    """
+    Fixed-size cache of verified tokens in a memory-mapped file shared by the processes of a host.
+    Same interface as TokenCache; the hit, miss, eviction and expiration counters are those of the current process.
+    """
+
+    def __init__(self, path=None, buckets=4096, ways=8, slot_size=1024, stripes=64, ttl=None, timer=time.time):
+        """
+        :param path: string with the path of the cache file, created with mode 0600 if missing; a file in
+            default_cache_dir() by default. An existing file must be a regular file owned by the current user and
+            not writable by the group or others.
+        :param buckets: number of buckets of the hash table
+        :param ways: number of slots of each bucket
+        :param slot_size: bytes of each slot; tokens with larger claims are not cached
+        :param stripes: number of locks sharing the buckets
+        :param ttl: optional maximum number of seconds a token is kept, if shorter than its expiry
+        :param timer: function returning the current epoch time in seconds
+        """
+        if buckets < 1 or ways < 1:
+            raise ValueError("buckets and ways must be at least 1")
+        if slot_size <= SLOT.size:
+            raise ValueError("slot_size must be larger than {}".format(SLOT.size))
+        if not 1 <= stripes <= HEADER_SIZE - HEADER.size:
+            raise ValueError("stripes must be between 1 and {}".format(HEADER_SIZE - HEADER.size))
+        if path is None:
+            path = os.path.join(default_cache_dir(), DEFAULT_FILENAME)
+        self.path = path
+        self.buckets = buckets
+        self.ways = ways
+        self.slot_size = slot_size
+        self.stripes = stripes
+        self.maxsize = buckets * ways
+        self.ttl = ttl
+        self._timer = timer
+        self._thread_locks = [threading.Lock() for _ in range(stripes)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        size = HEADER_SIZE + buckets * ways * slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            _check_private(self._fd, path)
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                self._init_file(size)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(self._fd, size)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _init_file(self, size):
+        # Must be called with the whole file locked
+        header = HEADER.pack(MAGIC, VERSION, self.buckets, self.ways, self.slot_size)
+        existing = os.pread(self._fd, HEADER.size, 0)
+        if existing == header and os.fstat(self._fd).st_size == size:
+            return
+        if existing.strip(b"\0"):
+            raise ValueError("{} is a cache file of another layout".format(self.path))
+        # New file: the slots are zero-filled, i.e. empty
+        os.ftruncate(self._fd, size)
+        os.pwrite(self._fd, header, 0)
+
+    def __len__(self):
+        now = self._timer()
+        return sum(1 for bucket in range(self.buckets) for _, expires_at, _ in self._read_bucket(bucket)
+                   if expires_at > now)
+
+    def close(self):
+        """Unmap and close the cache file"""
+        self._map.close()
+        os.close(self._fd)
+
+    digest = staticmethod(TokenCache.digest)
+
+    def get(self, token, issuers=None):
+        """
+        :param token: jwt string
+        :param issuers: optional container of the issuers accepted; a token of another issuer is a miss
+        :return: tuple (username, claims) of the verified token; None if not cached, expired or of another issuer
+        """
+        key = self.digest(token)
+        bucket = self._bucket(key)
+        with self._locked(bucket):
+            for offset in self._slot_offsets(bucket):
+                digest, expires_at, length = SLOT.unpack_from(self._map, offset)
+                if digest != key or expires_at == 0:
+                    continue
+                if expires_at <= self._timer():
+                    self._clear_slot(offset)
+                    self.expirations += 1
+                    break
+                payload = self._map[offset + SLOT.size:offset + SLOT.size + length]
+                username, claims = json.loads(payload.decode("utf-8"))
+                if issuers is not None and claims.get("iss") not in issuers:
+                    break
+                self.hits += 1
+                return username, claims
+        self.misses += 1
+        return None
+
+    def put(self, token, username, claims):
+        """
+        Cache a verified token until it expires
+        :param token: jwt string
+        :param username: string with the username of the token
+        :param claims: dict with the verified claims of the token
+        """
+        expires_at = claims["exp"]
+        if self.ttl is not None:
+            expires_at = min(expires_at, self._timer() + self.ttl)
+        payload = json.dumps([username, claims], separators=(",", ":")).encode("utf-8")
+        if SLOT.size + len(payload) > self.slot_size:
+            log.debug("Token claims too large to be cached: {} bytes".format(len(payload)))
+            return
+
+        key = self.digest(token)
+        bucket = self._bucket(key)
+        with self._locked(bucket):
+            now = self._timer()
+            target = None
+            target_expires_at = None
+            for offset in self._slot_offsets(bucket):
+                digest, slot_expires_at, _ = SLOT.unpack_from(self._map, offset)
+                if digest == key or slot_expires_at <= now:
+                    # Same token, empty slot or expired entry
+                    target = offset
+                    target_expires_at = None
+                    break
+                if target is None or slot_expires_at < target_expires_at:
+                    target = offset
+                    target_expires_at = slot_expires_at
+            if target_expires_at is not None:
+                # Bucket full of live entries: evict the one expiring first
+                self.evictions += 1
+            # Write the entry before its digest and expiry make it visible
+            self._map[target + SLOT.size:target + SLOT.size + len(payload)] = payload
+            SLOT.pack_into(self._map, target, key, expires_at, len(payload))
+
+    def clear(self):
+        """Remove all the cached tokens"""
+        for bucket in range(self.buckets):
+            with self._locked(bucket):
+                for offset in self._slot_offsets(bucket):
+                    self._clear_slot(offset)
+
+    def stats(self):
+        """
+        :return: dict with the size and the hit, miss, eviction and expiration counters of the cache
+        """
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _bucket(self, key):
+        return int.from_bytes(key[:8], "little") % self.buckets
+
+    def _slot_offsets(self, bucket):
+        start = HEADER_SIZE + bucket * self.ways * self.slot_size
+        return range(start, start + self.ways * self.slot_size, self.slot_size)
+
+    def _read_bucket(self, bucket):
+        with self._locked(bucket):
+            return [SLOT.unpack_from(self._map, offset) for offset in self._slot_offsets(bucket)]
+
+    def _clear_slot(self, offset):
+        SLOT.pack_into(self._map, offset, b"", 0, 0)
+
+    def _locked(self, bucket):
+        return _StripeLock(self, bucket % self.stripes)
+
+
+class _StripeLock(object):
+    """
+    Lock of a stripe of buckets, across the threads of the process and across the processes of the host
+    """
+    __slots__ = ("_cache", "_stripe")
+
+    def __init__(self, cache, stripe):
+        self._cache = cache
+        self._stripe = stripe
+
+    def __enter__(self):
+        self._cache._thread_locks[self._stripe].acquire()
+        try:
+            # fcntl locks are held by the process: the thread lock excludes the other threads of the process
+            fcntl.lockf(self._cache._fd, fcntl.LOCK_EX, 1, HEADER.size + self._stripe)
+        except Exception:
+            self._cache._thread_locks[self._stripe].release()
+            raise
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            fcntl.lockf(self._cache._fd, fcntl.LOCK_UN, 1, HEADER.size + self._stripe)
+        finally:
+            self._cache._thread_locks[self._stripe].release()
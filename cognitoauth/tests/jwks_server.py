@@ -0,0 +1,100 @@
+"""
+Local HTTP stand-in of the Cognito JWT Set endpoint
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+
+from cognitoauth.tests.tokens import TEST_USERPOOL_ID, jwks
+
+
+class JwksServer(object):
+    """
+    Serve the jwks.json document of the given test kids on a local port, optionally slowly or with errors.
+
+    with JwksServer("test-kid-1") as server:
+        keys = cognito_userpool_keys(server.userpool_iss)
+        server.set_kids("test-kid-1", "test-kid-2")
+    """
+
+    def __init__(self, *kids, latency=0, failure_rate=0, failure_status=503, seed=None):
+        """
+        :param kids: test kids of the keys served
+        :param latency: seconds waited before each response
+        :param failure_rate: fraction of the requests answered with failure_status
+        :param failure_status: HTTP status of the failed requests
+        :param seed: seed of the random failures
+        """
+        self.kids = list(kids)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self._random = random.Random(seed)
+        self.request_count = 0
+        self.failure_count = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def userpool_iss(self):
+        """Issuer of the stand-in User Pool"""
+        return "http://127.0.0.1:{}/{}".format(self._httpd.server_address[1], TEST_USERPOOL_ID)
+
+    def set_kids(self, *kids):
+        """Serve the keys of the given test kids from now on"""
+        self.kids = list(kids)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _respond(self, handler):
+        with self._lock:
+            self.request_count += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failure_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if handler.path != "/{}/.well-known/jwks.json".format(TEST_USERPOOL_ID):
+            handler.send_error(404)
+            return
+        if failed:
+            handler.send_error(self.failure_status)
+            return
+        body = json.dumps(jwks(*self.kids)).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._respond(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
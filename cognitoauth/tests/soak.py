@@ -0,0 +1,167 @@
+"""
+Key rotation soak harness: concurrent authorise_request load against a local JWKS stand-in server whose keys are
+rotated, reporting the latency percentiles and the error rate of each phase of the rotation.
+
+reports = run_soak(rotation_phases(duration=5), keys_factory=JwksProvider)
+"""
+import math
+import random
+import threading
+import time
+
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.jwks_server import JwksServer
+from cognitoauth.tests.tokens import TEST_REGION, TEST_USERPOOL_ID, mint_token
+from cognitoauth.token_verification import BEARER_PREFIX, authorise_request, cognito_userpool_keys
+
+
+class Phase(object):
+    """
+    Phase of a soak run: the keys served by the stand-in server and the keys signing the tokens of the load
+    """
+
+    def __init__(self, name, duration, served_kids, signing_kids, latency=0, failure_rate=0):
+        """
+        :param name: string with the name of the phase
+        :param duration: seconds of load
+        :param served_kids: test kids of the keys served by the stand-in server
+        :param signing_kids: test kids of the keys signing the tokens, chosen uniformly
+        :param latency: seconds waited by the stand-in server before each response
+        :param failure_rate: fraction of the requests to the stand-in server answered with an error
+        """
+        self.name = name
+        self.duration = duration
+        self.served_kids = served_kids
+        self.signing_kids = signing_kids
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+
+def rotation_phases(duration, latency=0, failure_rate=0):
+    """
+    Phases of a Cognito key rotation: the new key is published, then signs the new tokens, then the old key is retired
+    :param duration: seconds of load per phase
+    :param latency: seconds waited by the stand-in server during the rotation
+    :param failure_rate: fraction of the requests to the stand-in server failing during the rotation
+    :return: list of Phase
+    """
+    return [
+        Phase("before", duration, ["test-kid-1"], ["test-kid-1"]),
+        Phase("during", duration, ["test-kid-1", "test-kid-2"], ["test-kid-1", "test-kid-2"], latency, failure_rate),
+        Phase("after", duration, ["test-kid-2"], ["test-kid-2"]),
+    ]
+
+
+def static_keys_factory(userpool_iss):
+    """
+    :param userpool_iss: string with the issuer of the stand-in User Pool
+    :return: JwkSet downloaded once, as done by processes which never refresh their keys
+    """
+    return JwkSet(cognito_userpool_keys(userpool_iss))
+
+
+class _Request(object):
+    """Minimal request with the headers read by authorise_request"""
+
+    def __init__(self, token):
+        self.headers = {"Authorization": BEARER_PREFIX + token}
+
+
+def run_soak(phases, keys_factory, concurrency=4, tokens_per_kid=4, seed=0):
+    """
+    Run the phases one after the other against one stand-in server and one set of keys.
+
+    The phases must be longer than the min_refetch_interval of a JwksProvider: its refetch rate limit counts from
+    the first download, so that a rotation starting sooner is only picked up once the interval has elapsed and
+    reports errors which would not happen in production, where rotations come long after the first download.
+    Short runs scale the interval down, e.g. JwksProvider(userpool_iss, min_refetch_interval=duration / 10).
+    :param phases: list of Phase
+    :param keys_factory: function returning the keys given the issuer of the stand-in server, e.g. JwksProvider
+    :param concurrency: number of threads calling authorise_request
+    :param tokens_per_kid: number of distinct tokens signed by each key
+    :param seed: seed of the choices of tokens and of the failures of the stand-in server
+    :return: list of dict reports of the phases
+    """
+    kids = sorted({kid for phase in phases for kid in phase.signing_kids})
+    requests = {kid: [_Request(mint_token(kid=kid, jti="{}-{}".format(kid, i))) for i in range(tokens_per_kid)]
+                for kid in kids}
+
+    reports = []
+    with JwksServer(*phases[0].served_kids, seed=seed) as server:
+        # The tokens carry the Cognito issuer; the keys are downloaded from the stand-in server
+        userpool_keys = keys_factory(server.userpool_iss)
+        try:
+            for phase in phases:
+                server.set_kids(*phase.served_kids)
+                server.latency = phase.latency
+                server.failure_rate = phase.failure_rate
+                jwks_requests = server.request_count
+                phase_requests = [request for kid in phase.signing_kids for request in requests[kid]]
+                report = _run_phase(phase, phase_requests, userpool_keys, concurrency, seed)
+                report["jwks_requests"] = server.request_count - jwks_requests
+                reports.append(report)
+        finally:
+            if hasattr(userpool_keys, "stop"):
+                userpool_keys.stop()
+    return reports
+
+
+def _run_phase(phase, requests, userpool_keys, concurrency, seed):
+    stopped = threading.Event()
+    results = []
+
+    def load(worker):
+        rng = random.Random("{}-{}-{}".format(seed, phase.name, worker))
+        durations, errors = [], {}
+        while not stopped.is_set():
+            request = rng.choice(requests)
+            start = time.perf_counter()
+            try:
+                authorise_request(request, TEST_REGION, TEST_USERPOOL_ID, userpool_keys)
+            except Exception as e:
+                message = str(e)
+                errors[message] = errors.get(message, 0) + 1
+            durations.append(time.perf_counter() - start)
+        results.append((durations, errors))
+
+    threads = [threading.Thread(target=load, args=(worker,), daemon=True) for worker in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(phase.duration)
+    stopped.set()
+    for thread in threads:
+        thread.join()
+
+    durations = sorted(duration for worker_durations, _ in results for duration in worker_durations)
+    errors = {}
+    for _, worker_errors in results:
+        for message, count in worker_errors.items():
+            errors[message] = errors.get(message, 0) + count
+    error_count = sum(errors.values())
+    return {
+        "phase": phase.name,
+        "requests": len(durations),
+        "errors": error_count,
+        "error_rate": round(error_count / len(durations), 4) if durations else None,
+        "p50_ms": _percentile_ms(durations, 50),
+        "p99_ms": _percentile_ms(durations, 99),
+        "max_ms": round(durations[-1] * 1000, 3) if durations else None,
+        "errors_by_message": errors,
+    }
+
+
+def percentile(sorted_values, pct):
+    """
+    :param sorted_values: list of values sorted in ascending order
+    :param pct: percentile between 0 and 100
+    :return: value at the given percentile (nearest rank); None if there are no values
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(math.ceil(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def _percentile_ms(sorted_durations, pct):
+    value = percentile(sorted_durations, pct)
+    return None if value is None else round(value * 1000, 3)
@@ -0,0 +1,104 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from mock import Mock
+from pytest import raises
+import time
+
+from cognitoauth.aio import AsyncJwksProvider, authorise_request_async, verify_token_async, verify_token_result_async
+from cognitoauth.reasons import FailureReason
+from cognitoauth.cache import TokenCache
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.jwks_server import JwksServer
+from cognitoauth.tests.tokens import TEST_ISS, TEST_REGION, TEST_USERNAME, TEST_USERPOOL_ID, jwks, mint_token
+from cognitoauth.token_verification import validate_jwt
+
+
+def test_authorise_request_async():
+    """Test authorise_request_async
+    """
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+    cache = TokenCache()
+    mock_request = Mock()
+
+    async def authorise(token):
+        mock_request.headers.get = Mock(return_value=token)
+        return await authorise_request_async(mock_request, TEST_REGION, TEST_USERPOOL_ID, key_set, cache)
+
+    ###########################################################################
+    # Test case: valid token, verified then served from the cache
+    token = mint_token()
+    assert asyncio.run(authorise(token)) == TEST_USERNAME
+    assert asyncio.run(authorise(token)) == TEST_USERNAME
+    assert cache.hits == 1
+
+    ###########################################################################
+    # Test case: invalid token
+    with raises(Exception, match="Token validation failed: Token has expired"):
+        asyncio.run(authorise(mint_token(expires_in=-60)))
+
+    ###########################################################################
+    # Test case: user id not found in the token
+    with raises(Exception, match="Username not found in token"):
+        asyncio.run(authorise(mint_token(username=None)))
+
+    ###########################################################################
+    # Test case: results, verified and rejected
+    result = asyncio.run(verify_token_result_async(token, TEST_ISS, key_set, cache))
+    assert result and result.username == TEST_USERNAME
+    result = asyncio.run(verify_token_result_async(mint_token(expires_in=-60), TEST_ISS, key_set))
+    assert not result and result.reason is FailureReason.EXPIRED
+
+
+def test_async_jwks_provider():
+    """Test AsyncJwksProvider across a key rotation
+    """
+    async def run(server):
+        iss = server.userpool_iss
+        provider = AsyncJwksProvider(iss, min_refetch_interval=0)
+        assert await provider.get_key_async("test-kid-1") is not None
+
+        # The synchronous functions refuse it instead of awaiting nothing
+        with raises(TypeError, match="provider attribute"):
+            validate_jwt(mint_token(iss=iss), iss, provider)
+
+        server.set_kids("test-kid-2")
+        token = mint_token(kid="test-kid-2", iss=iss)
+        results = await asyncio.gather(*[verify_token_async(token, iss, provider) for _ in range(16)])
+        assert all(msg is None for claims, username, msg in results)
+
+        assert await provider.refresh() is True
+        await provider.stop()
+
+    with JwksServer("test-kid-1") as server:
+        asyncio.run(run(server))
+        assert server.request_count == 3
+
+
+def test_event_loop_not_stalled():
+    """Test the event loop keeps ticking while many tokens are verified
+    """
+    key_set = JwkSet(jwks("test-kid-1", "test-kid-2")["keys"])
+    tokens = [mint_token(kid=kid, jti=str(i)) for i in range(20) for kid in ["test-kid-1", "test-kid-2"]]
+    tick = 0.005
+
+    async def ticker(stop, lags):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(tick)
+            lags.append(time.perf_counter() - start - tick)
+
+    async def run():
+        stop, lags = asyncio.Event(), []
+        ticking = asyncio.ensure_future(ticker(stop, lags))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = await asyncio.gather(*[
+                verify_token_async(token, TEST_ISS, key_set, executor=executor) for token in tokens
+            ])
+        stop.set()
+        await ticking
+        return results, lags
+
+    results, lags = asyncio.run(run())
+    assert all(msg is None for claims, username, msg in results)
+    assert len(lags) > 0
+    assert max(lags) < 0.1
@@ -0,0 +1,69 @@
+from pytest import fixture, importorskip, raises
+
+import cognitoauth.backends as backends
+import cognitoauth.token_verification as auth
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.tokens import TEST_ISS, jwks, mint_token
+
+
+@fixture
+def restore_backend():
+    yield
+    backends.set_backend(None)
+
+
+def check_backend(backend):
+    key_set = JwkSet(jwks("test-kid-1", "test-kid-2")["keys"], backend=backend)
+    assert len(key_set) == 2
+
+    ###########################################################################
+    # Test case: valid signature
+    for token_use in ["access", "id"]:
+        assert auth.validate_jwt(mint_token(token_use=token_use), TEST_ISS, key_set) == (True, None)
+
+    ###########################################################################
+    # Test case: invalid signature
+    passed, msg = auth.validate_jwt(mint_token(signing_kid="test-kid-2"), TEST_ISS, key_set)
+    assert passed is False and msg == "Failed to verify signature"
+
+    header, claims, signature = mint_token().split(".")
+    passed, msg = auth.validate_jwt(".".join([header, claims, signature[:-8]]), TEST_ISS, key_set)
+    assert passed is False and msg.startswith("Failed to verify signature")
+
+
+def test_jose_backend():
+    """Test JoseBackend
+    """
+    check_backend(backends.JoseBackend())
+
+
+def test_cryptography_backend():
+    """Test CryptographyBackend
+    """
+    importorskip("cryptography")
+    backend = backends.CryptographyBackend()
+    check_backend(backend)
+
+    # Test case: only RS256 RSA keys are supported
+    with raises(ValueError):
+        backend.load_key({"kty": "EC"}, "ES256")
+
+
+def test_select_backend(restore_backend):
+    """Test select_backend, get_backend and set_backend
+    """
+    try:
+        import cryptography  # noqa: F401
+        assert backends.select_backend().name == "cryptography"
+    except ImportError:
+        assert backends.select_backend().name == "jose"
+    assert backends.select_backend("jose").name == "jose"
+
+    backends.set_backend("jose")
+    assert backends.get_backend().name == "jose"
+    assert isinstance(JwkSet(jwks("test-kid-1")["keys"]).get_key("test-kid-1")[1], type(
+        backends.JoseBackend().load_key(jwks("test-kid-1")["keys"][0], "RS256")
+    ))
+
+    backends.set_backend(None)
+    assert backends.get_backend().name == backends.select_backend().name
@@ -0,0 +1,75 @@
+from jose.utils import base64url_encode
+from mock import patch
+import pickle
+
+import cognitoauth.token_verification as auth
+from cognitoauth.batch import validate_many
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.tokens import TEST_ISS, jwks, mint_token
+
+
+def summary(results):
+    # The expiry message holds the time elapsed since the token expired
+    return [(passed, msg if msg is None else msg[:24]) for passed, msg in results]
+
+
+def test_validate_many():
+    """Test validate_many
+    """
+    key_set = JwkSet(jwks("test-kid-1", "test-kid-2")["keys"])
+    valid_1, valid_2 = mint_token(kid="test-kid-1"), mint_token(kid="test-kid-2")
+    expired, unknown_kid = mint_token(expires_in=-60), mint_token(kid="test-kid-3")
+    tokens = [valid_1, expired, "garbage", valid_2, unknown_kid, valid_1, valid_2, valid_1]
+    expected = summary([auth.validate_jwt(token, TEST_ISS, key_set) for token in tokens])
+
+    ###########################################################################
+    # Test case: results in input order, with threads and processes
+    assert summary(validate_many(tokens, TEST_ISS, key_set, max_workers=2, chunk_size=1)) == expected
+    results = validate_many(tokens, TEST_ISS, key_set, max_workers=2, use_processes=True, chunk_size=1)
+    assert summary(results) == expected
+    assert summary(validate_many(tokens, TEST_ISS, jwks("test-kid-1", "test-kid-2")["keys"])) == expected
+
+    ###########################################################################
+    # Test case: identical tokens are validated once
+    with patch("cognitoauth.batch.validate_jwt", side_effect=auth.validate_jwt) as mock_validate:
+        results = validate_many(tokens, TEST_ISS, key_set, max_workers=2, chunk_size=2)
+        assert summary(results) == expected
+        # "garbage" and expired are rejected before dispatch, unknown_kid without calling validate_jwt
+        assert mock_validate.call_count == 4
+
+    ###########################################################################
+    # Test case: each kid is resolved once
+    with patch.object(JwkSet, "get_key", autospec=True, side_effect=JwkSet.get_key) as mock_get_key:
+        validate_many([valid_1] * 3 + [valid_2] * 3, TEST_ISS, key_set, use_processes=True, chunk_size=100)
+        parent_calls = [call for call in mock_get_key.call_args_list if call[0][0] is key_set]
+        assert sorted(call[0][1] for call in parent_calls) == ["test-kid-1", "test-kid-2"]
+
+    distinct = [mint_token(kid=kid, jti="jti-{}".format(i)) for kid in ["test-kid-1", "test-kid-2"] for i in range(4)]
+    with patch.object(JwkSet, "get_key", autospec=True, side_effect=JwkSet.get_key) as mock_get_key:
+        results = validate_many(distinct, TEST_ISS, key_set, max_workers=2, chunk_size=2)
+        assert results == [(True, None)] * len(distinct)
+        assert sorted(call[0][1] for call in mock_get_key.call_args_list) == ["test-kid-1", "test-kid-2"]
+
+    ###########################################################################
+    # Test case: tokens rejected by their unverified header or claims never reach the keys
+    unhashable_kid = ".".join([base64url_encode(b'{"alg": "RS256", "kid": [1]}').decode(), valid_1.split(".")[1], ""])
+    rejected = [mint_token(kid="test-kid-3", expires_in=-60), mint_token(kid="test-kid-3", iss="https://example.com"),
+                unhashable_kid]
+    expected = summary([auth.validate_jwt(token, TEST_ISS, key_set) for token in rejected])
+    assert [msg for _, msg in expected] == ["Token has expired -1 day", "Invalid issuer in token",
+                                            "Failed to decode token: "]
+    with patch.object(JwkSet, "get_key", autospec=True, side_effect=JwkSet.get_key) as mock_get_key:
+        assert summary(validate_many(rejected, TEST_ISS, key_set)) == expected
+        assert mock_get_key.call_count == 0
+
+    ###########################################################################
+    # Test case: nothing to validate
+    assert validate_many([], TEST_ISS, key_set) == []
+
+
+def test_jwk_set_pickle():
+    """Test JwkSet is rebuilt when pickled, e.g. to be sent to another process
+    """
+    key_set = pickle.loads(pickle.dumps(JwkSet(jwks("test-kid-1")["keys"])))
+    assert key_set.kids == ["test-kid-1"]
+    assert auth.validate_jwt(mint_token(), TEST_ISS, key_set) == (True, None)
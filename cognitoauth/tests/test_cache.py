@@ -0,0 +1,106 @@
+from mock import Mock, patch
+
+import cognitoauth.token_verification as auth
+from cognitoauth.cache import TokenCache
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.tokens import TEST_ISS, TEST_REGION, TEST_USERNAME, TEST_USERPOOL_ID, jwks, mint_token
+
+
+class FakeTimer(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_cache():
+    """Test TokenCache
+    """
+    timer = FakeTimer(1000)
+    cache = TokenCache(maxsize=2, timer=timer)
+
+    ###########################################################################
+    # Test case: miss then hit
+    assert cache.get("token-a") is None
+    cache.put("token-a", "user-a", {"exp": 2000})
+    assert cache.get("token-a") == ("user-a", {"exp": 2000})
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    ###########################################################################
+    # Test case: changes to the claims put or returned do not change the cached entry
+    other = TokenCache(timer=timer)
+    claims = {"exp": 2000}
+    other.put("token-m", "user-m", claims)
+    claims["request_id"] = "1"
+    other.get("token-m")[1]["request_id"] = "2"
+    assert other.get("token-m") == ("user-m", {"exp": 2000})
+
+    ###########################################################################
+    # Test case: a token of another issuer is a miss
+    other = TokenCache(timer=timer)
+    other.put("token-i", "user-i", {"exp": 2000, "iss": "https://a"})
+    assert other.get("token-i", ("https://b",)) is None and other.misses == 1 and other.hits == 0
+    assert other.get("token-i", ("https://a",)) is not None and other.hits == 1
+
+    ###########################################################################
+    # Test case: least recently used token is evicted
+    cache.put("token-b", "user-b", {"exp": 2000})
+    cache.get("token-a")
+    cache.put("token-c", "user-c", {"exp": 2000})
+    assert len(cache) == 2
+    assert cache.get("token-b") is None
+    assert cache.get("token-a") is not None and cache.get("token-c") is not None
+    assert cache.evictions == 1
+
+    ###########################################################################
+    # Test case: entries do not outlive the exp claim, nor the ttl
+    timer.now = 2000
+    assert cache.get("token-a") is None
+    assert cache.expirations == 1
+
+    cache = TokenCache(ttl=10, timer=timer)
+    cache.put("token-a", "user-a", {"exp": 3000})
+    timer.now = 2010
+    assert cache.get("token-a") is None
+
+    ###########################################################################
+    # Test case: clear
+    cache.put("token-a", "user-a", {"exp": 3000})
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["size"] == 0
+
+
+def test_authorise_request_with_token_cache():
+    """Test authorise_request with a TokenCache
+    """
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+    cache = TokenCache()
+    token = mint_token()
+    mock_request = Mock()
+    mock_request.headers.get = Mock(return_value=token)
+
+    ###########################################################################
+    # Test case: first request is verified and cached, next ones skip the crypto
+    assert auth.authorise_request(mock_request, TEST_REGION, TEST_USERPOOL_ID, key_set, cache) == TEST_USERNAME
+    assert cache.misses == 1 and len(cache) == 1
+
+    with patch("cognitoauth.token_verification._resolve_key") as mock_resolve:
+        for _ in range(3):
+            assert auth.authorise_request(mock_request, TEST_REGION, TEST_USERPOOL_ID, key_set, cache) == TEST_USERNAME
+        assert mock_resolve.call_count == 0
+    assert cache.hits == 3
+
+    ###########################################################################
+    # Test case: a cached token is not accepted for another user pool
+    passed, msg = auth.validate_jwt(token, "https://example.com", key_set, cache)
+    assert passed is False and msg == "Invalid issuer in token"
+    assert cache.hits == 3
+
+    ###########################################################################
+    # Test case: failed tokens are not cached
+    expired_token = mint_token(expires_in=-60)
+    for _ in range(2):
+        passed, msg = auth.validate_jwt(expired_token, TEST_ISS, key_set, cache)
+        assert passed is False and msg.startswith("Token has expired")
+    assert len(cache) == 1
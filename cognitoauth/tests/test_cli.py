@@ -0,0 +1,133 @@
+import gzip
+import json
+import time
+from mock import patch
+from pytest import raises
+
+from cognitoauth.batch import verify_stream
+from cognitoauth.cli import jsonl_token, main, parse_time, text_token
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.tokens import TEST_ISS, TEST_REGION, TEST_USERNAME, TEST_USERPOOL_ID, jwks, mint_token
+
+
+def run(tmp_path, lines, *args):
+    log_path = tmp_path / "access.log.gz"
+    with gzip.open(str(log_path), "wt") as f:
+        f.write("\n".join(lines) + "\n")
+    jwks_path = tmp_path / "jwks.json"
+    jwks_path.write_text(json.dumps(jwks("test-kid-1")))
+    output_path = tmp_path / "results.jsonl"
+    assert main(["--jwks", str(jwks_path), "--region", TEST_REGION, "--user-pool-id", TEST_USERPOOL_ID,
+                 "--output", str(output_path), str(log_path)] + list(args)) == 0
+    return [json.loads(line) for line in output_path.read_text().splitlines()]
+
+
+def test_extract_tokens():
+    """Test the tokens and times extracted from the log lines
+    """
+    token = mint_token()
+
+    ###########################################################################
+    # Test case: plain text lines
+    assert text_token('10.0.0.1 - "GET /" 200 "Authorization: Bearer {}"'.format(token)) == token
+    assert text_token("{} 200".format(token)) == token
+    assert text_token("GET / 401") is None
+
+    ###########################################################################
+    # Test case: JSON lines
+    line = json.dumps({"headers": {"authorization": "Bearer " + token}, "time": "2020-01-01T00:00:00Z"})
+    assert jsonl_token(line, "headers.Authorization", "time") == (token, 1577836800.0, None)
+    assert jsonl_token(line, "headers.Authorization") == (token, None, None)
+    assert jsonl_token(json.dumps({"headers": {}}), "headers.Authorization", "time") == (None, None, None)
+    assert jsonl_token("not json", "headers.Authorization") == (None, None, None)
+
+    ###########################################################################
+    # Test case: the token is kept when the time cannot be parsed
+    line = json.dumps({"headers": {"authorization": token}, "time": "yesterday"})
+    assert jsonl_token(line, "headers.Authorization", "time") == (token, None, "Invalid request time: yesterday")
+
+    ###########################################################################
+    # Test case: times
+    assert parse_time(1577836800) == parse_time("1577836800") == parse_time("2020-01-01T00:00:00")
+    assert parse_time("2020-01-01T10:00:00+10:00") == 1577836800.0
+    assert parse_time("01/Jan/2020:10:00:00 +1000") == parse_time("01/Jan/2020:00:00:00 +0000") == 1577836800.0
+    assert parse_time(1577836800000) == parse_time("1577836800000") == 1577836800.0
+    for value in ["nan", "inf", True, "yesterday"]:
+        with raises((TypeError, ValueError)):
+            parse_time(value)
+
+
+def test_verify_stream():
+    """Test verify_stream yields the results in order, with and without processes
+    """
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+    issued_at = int(time.time()) - 7200
+    tokens = [mint_token(username="user-{}".format(i), expires_in=60 * (i % 3) - 30, iat=issued_at) for i in range(12)]
+    items = [(token, None) for token in tokens] + [(None, None), (tokens[0], time.time() - 3600)]
+
+    expected = [username for _, username, _ in verify_stream(items, TEST_ISS, key_set, max_workers=0)]
+    assert expected == [None if i % 3 == 0 else "user-{}".format(i) for i in range(12)] + [None, "user-0"]
+
+    results = verify_stream(iter(items), TEST_ISS, key_set, max_workers=2, chunk_size=1, max_pending=3)
+    assert [username for _, username, _ in results] == expected
+
+
+def test_main(tmp_path):
+    """Test the command line verification of access logs
+    """
+    now = time.time()
+    issued_at = int(now) - 7200
+    valid, expired = mint_token(iat=issued_at), mint_token(expires_in=-3600, iat=issued_at)
+    issued_later = mint_token()
+
+    ###########################################################################
+    # Test case: plain text logs, verified now or at the given time
+    results = run(tmp_path, ["GET / Bearer " + valid, "GET / " + expired, "GET /", "GET / Bearer garbage"])
+    assert [result["valid"] for result in results] == [True, False, False, False]
+    assert results[0]["username"] == TEST_USERNAME and results[1]["error"].startswith("Token has expired")
+    assert results[2]["error"] == "No token found in header"
+    assert [result["line"] for result in results] == [1, 2, 3, 4]
+
+    results = run(tmp_path, [valid, expired], "--as-of", str(now - 3660), "--workers", "2")
+    assert [result["valid"] for result in results] == [True, True]
+
+    ###########################################################################
+    # Test case: a token issued after the given time is rejected
+    results = run(tmp_path, [issued_later, valid], "--as-of", str(now - 30 * 86400))
+    assert [result["valid"] for result in results] == [False, False]
+    assert results[0]["error"].startswith("Token is not valid until")
+    results = run(tmp_path, [issued_later], "--as-of", str(now - 30))
+    assert [result["valid"] for result in results] == [True]
+
+    ###########################################################################
+    # Test case: forged times and failures are reported on their own line
+    forged = [mint_token(exp=-1e300), mint_token(nbf=1e300), mint_token(exp=float("nan"))]
+    for workers in ["0", "2"]:
+        results = run(tmp_path, [valid] + forged + [valid], "--as-of", str(now), "--workers", workers)
+        assert [result["valid"] for result in results] == [True, False, False, False, True]
+        assert [result["error"] for result in results[1:4]] == [
+            "Token has no valid expiry", "Token is not valid yet", "Token has no valid expiry"
+        ]
+    with patch("cognitoauth.batch.verify_token", side_effect=[(None, None, None), OverflowError("too large")]):
+        results = run(tmp_path, [valid, expired], "--workers", "0")
+    assert results[1] == {"line": 2, "valid": False, "username": None, "sub": None, "exp": None,
+                          "error": "Failed to verify token: too large"}
+
+    ###########################################################################
+    # Test case: JSON logs verified at the time of each request
+    lines = [json.dumps({"headers": {"Authorization": token}, "requestTime": request_time})
+             for token, request_time in [(valid, now), (expired, now - 3660), (expired, now), (valid, now - 7300)]]
+    results = run(tmp_path, lines, "--format", "jsonl", "--time-field", "requestTime", "--workers", "0")
+    assert [result["valid"] for result in results] == [True, True, False, False]
+
+    ###########################################################################
+    # Test case: API Gateway times, in Common Log Format and in epoch milliseconds
+    clf_time = time.strftime("%d/%b/%Y:%H:%M:%S +0000", time.gmtime(now - 3660))
+    lines = [json.dumps({"headers": {"Authorization": expired}, "requestTime": clf_time,
+                         "requestTimeEpoch": int((now - 3660) * 1000)}),
+             json.dumps({"headers": {"Authorization": expired}, "requestTime": "16/10/2026",
+                         "requestTimeEpoch": "later"})]
+    for time_field in ["requestTime", "requestTimeEpoch"]:
+        results = run(tmp_path, lines, "--format", "jsonl", "--time-field", time_field, "--workers", "0")
+        assert [result["valid"] for result in results] == [True, False]
+        assert results[1]["error"].startswith("Invalid request time")
@@ -0,0 +1,121 @@
+from mock import Mock
+from pytest import fixture, raises
+
+import cognitoauth.token_verification as auth
+from cognitoauth.cache import TokenCache
+from cognitoauth.instrumentation import (
+    NULL_INSTRUMENTATION, Instrumentation, PrometheusInstrumentation, StatsdInstrumentation, get_instrumentation,
+    set_instrumentation
+)
+from cognitoauth.jwks import JwkSet
+from cognitoauth.reasons import FailureReason
+from cognitoauth.tests.jwks_server import JwksServer
+from cognitoauth.tests.tokens import TEST_ISS, jwks, mint_token
+
+
+class RecordingInstrumentation(Instrumentation):
+    def __init__(self):
+        self.timings = []
+        self.events = []
+
+    def timing(self, stage, seconds):
+        self.timings.append(stage)
+
+    def count(self, event, reason=None):
+        self.events.append((event, reason))
+
+
+@fixture
+def recording():
+    instrumentation = RecordingInstrumentation()
+    set_instrumentation(instrumentation)
+    yield instrumentation
+    set_instrumentation(None)
+
+
+def test_set_instrumentation():
+    """Test set_instrumentation
+    """
+    assert get_instrumentation() is NULL_INSTRUMENTATION
+    instrumentation = RecordingInstrumentation()
+    set_instrumentation(instrumentation)
+    assert get_instrumentation() is instrumentation
+    set_instrumentation(None)
+    assert get_instrumentation() is NULL_INSTRUMENTATION
+
+
+def test_verification_stages_and_failure_reasons(recording):
+    """Test the stages and events reported while verifying tokens
+    """
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+    cache = TokenCache()
+    token = mint_token()
+
+    ###########################################################################
+    # Test case: verified token goes through all the stages
+    assert auth.validate_jwt(token, TEST_ISS, key_set, cache) == (True, None)
+    assert recording.timings == ["decode", "claims", "key_lookup", "signature"]
+    assert recording.events == [("verified", None)]
+
+    ###########################################################################
+    # Test case: cached token
+    assert auth.validate_jwt(token, TEST_ISS, key_set, cache) == (True, None)
+    assert recording.events[-1] == ("cache_hit", None)
+
+    ###########################################################################
+    # Test case: failure reasons are stable codes
+    rejected = [
+        ("garbage", FailureReason.MALFORMED),
+        (mint_token(iss="https://example.com"), FailureReason.INVALID_ISSUER),
+        (mint_token(token_use="refresh"), FailureReason.INVALID_TOKEN_USE),
+        (mint_token(expires_in=-60), FailureReason.EXPIRED),
+        (mint_token(kid="test-kid-3"), FailureReason.UNKNOWN_KID),
+        (mint_token(signing_kid="test-kid-2"), FailureReason.INVALID_SIGNATURE),
+    ]
+    for token, reason in rejected:
+        del recording.events[:]
+        passed, msg = auth.validate_jwt(token, TEST_ISS, key_set)
+        assert passed is False
+        assert recording.events == [("rejected", reason.value)]
+
+    del recording.events[:]
+    mock_request = Mock()
+    mock_request.headers.get = Mock(return_value=None)
+    with raises(Exception, match="No token found in header"):
+        auth.retrieve_header_token(mock_request)
+    assert recording.events == [("rejected", "no_token")]
+
+
+def test_jwks_download_instrumentation(recording):
+    """Test the JWT Set download is timed
+    """
+    with JwksServer("test-kid-1") as server:
+        assert auth.cognito_userpool_keys(server.userpool_iss) is not None
+        assert auth.cognito_userpool_keys(server.userpool_iss + "-unknown") is None
+    assert recording.timings == ["jwks_download", "jwks_download"]
+    assert recording.events == [("jwks_download_failed", None)]
+
+
+def test_statsd_instrumentation():
+    """Test StatsdInstrumentation
+    """
+    client = Mock()
+    instrumentation = StatsdInstrumentation(client, prefix="auth")
+    instrumentation.timing("signature", 0.002)
+    instrumentation.count("verified")
+    instrumentation.count("rejected", "expired")
+    client.timing.assert_called_once_with("auth.signature", 2.0)
+    assert [call[0][0] for call in client.incr.call_args_list] == ["auth.verified", "auth.rejected.expired"]
+
+
+def test_prometheus_instrumentation():
+    """Test PrometheusInstrumentation
+    """
+    histogram, counter = Mock(), Mock()
+    instrumentation = PrometheusInstrumentation(histogram, counter)
+    instrumentation.timing("signature", 0.002)
+    instrumentation.count("rejected", "expired")
+    histogram.labels.assert_called_once_with("signature")
+    histogram.labels.return_value.observe.assert_called_once_with(0.002)
+    counter.labels.assert_called_once_with("rejected", "expired")
+    counter.labels.return_value.inc.assert_called_once_with()
@@ -0,0 +1,62 @@
+from mock import Mock, patch
+
+import cognitoauth.token_verification as auth
+from cognitoauth.backends import get_backend
+from cognitoauth.jwks import JwkSet
+from cognitoauth.tests.tokens import TEST_ISS, TEST_REGION, TEST_USERNAME, TEST_USERPOOL_ID, jwks, mint_token
+
+
+def test_jwk_set():
+    """Test JwkSet
+    """
+    ###########################################################################
+    # Test case: keys are indexed by kid
+    key_set = JwkSet(jwks("test-kid-1", "test-kid-2")["keys"])
+    assert len(key_set) == 2
+    assert "test-kid-1" in key_set and "test-kid-3" not in key_set
+    assert sorted(key_set.kids) == ["test-kid-1", "test-kid-2"]
+    assert key_set.get_jwk("test-kid-2")["kid"] == "test-kid-2"
+    alg, key = key_set.get_key("test-kid-1")
+    assert alg == "RS256" and hasattr(key, "verify")
+    assert key_set.get_key("test-kid-3") is None
+
+    ###########################################################################
+    # Test case: ambiguous, unsupported and invalid keys are ignored
+    keys = jwks("test-kid-1", "test-kid-1", "test-kid-2")["keys"]
+    keys[2]["alg"] = "HS256"
+    keys.append({"kid": "broken", "kty": "RSA", "n": "", "e": ""})
+    keys.append({"kty": "RSA"})
+    assert len(JwkSet(keys)) == 0
+
+    ###########################################################################
+    # Test case: empty key set
+    assert len(JwkSet(None)) == 0
+
+
+def test_validate_jwt_with_jwk_set():
+    """Test validate_jwt and authorise_request with a JwkSet
+    """
+    key_set = JwkSet(jwks("test-kid-1", "test-kid-2")["keys"])
+
+    ###########################################################################
+    # Test case: no key is built on the request path
+    tokens = [mint_token(kid=kid) for kid in ["test-kid-1", "test-kid-2"]]
+    with patch.object(get_backend(), "load_key") as mock_load_key, patch("jose.jwk.construct") as mock_construct:
+        mock_load_key.side_effect = AssertionError("key built on the request path")
+        mock_construct.side_effect = AssertionError("key built on the request path")
+        for token in tokens:
+            assert auth.validate_jwt(token, TEST_ISS, key_set) == (True, None)
+
+            mock_request = Mock()
+            mock_request.headers.get = Mock(return_value=token)
+            assert auth.authorise_request(mock_request, TEST_REGION, TEST_USERPOOL_ID, key_set) == TEST_USERNAME
+
+    ###########################################################################
+    # Test case: unknown kid
+    passed, msg = auth.validate_jwt(mint_token(kid="test-kid-3"), TEST_ISS, key_set)
+    assert passed is False and msg == "Obtained keys are wrong"
+
+    ###########################################################################
+    # Test case: token signed with another key of the set
+    passed, msg = auth.validate_jwt(mint_token(kid="test-kid-1", signing_kid="test-kid-2"), TEST_ISS, key_set)
+    assert passed is False and msg.startswith("Failed to verify signature")
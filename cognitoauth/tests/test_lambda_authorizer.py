@@ -0,0 +1,146 @@
+import json
+from mock import patch
+import os
+from pytest import fixture, raises
+import subprocess
+import sys
+import time
+
+import cognitoauth.lambda_authorizer as authorizer
+from cognitoauth.tests.jwks_server import JwksServer
+from cognitoauth.tests.tokens import TEST_REGION, TEST_USERNAME, TEST_USERPOOL_ID, TEST_ISS, jwks, mint_token
+
+
+@fixture
+def environ(tmp_path):
+    authorizer._state = None
+    yield {
+        "COGNITO_REGION": TEST_REGION,
+        "COGNITO_USER_POOL_ID": TEST_USERPOOL_ID,
+        "COGNITO_JWKS_CACHE_PATH": str(tmp_path / "jwks-cache.json"),
+    }
+    authorizer._state = None
+
+
+def test_import_is_light():
+    """Test importing the authorizer loads neither python-jose nor requests, and is fast
+    """
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import cognitoauth.lambda_authorizer\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(elapsed, 'jose' in sys.modules, 'requests' in sys.modules)\n"
+    )
+    output = subprocess.check_output([sys.executable, "-c", script]).decode().split()
+    elapsed, jose_loaded, requests_loaded = float(output[0]), output[1], output[2]
+    assert jose_loaded == "False" and requests_loaded == "False"
+    assert elapsed < 1.0
+
+
+def test_handler_with_bundled_snapshot(environ, tmp_path):
+    """Test the first invocation uses the bundled snapshot, without any download
+    """
+    bundled_path = str(tmp_path / "jwks.json")
+    authorizer.save_snapshot(bundled_path, jwks("test-kid-1")["keys"])
+    environ["COGNITO_JWKS_PATH"] = bundled_path
+    method_arn = "arn:aws:execute-api:ap-southeast-2:123456789012:abcdef1234/prod/GET/orders/1"
+    event = {"authorizationToken": "Bearer " + mint_token(), "methodArn": method_arn}
+
+    ###########################################################################
+    # Test case: first call on a cold state is verified with the snapshot keys, quickly; the whole stage is allowed,
+    # as API Gateway may cache the policy for the other methods and paths
+    with patch.dict(os.environ, environ):
+        start = time.perf_counter()
+        policy = authorizer.handler(event, None)
+        elapsed = time.perf_counter() - start
+    state = authorizer.warm_state()
+    assert elapsed < 1.0
+    assert policy["principalId"] == TEST_USERNAME
+    assert policy["policyDocument"]["Statement"][0] == {
+        "Action": "execute-api:Invoke", "Effect": "Allow",
+        "Resource": "arn:aws:execute-api:ap-southeast-2:123456789012:abcdef1234/prod/*"
+    }
+    assert policy["context"]["token_use"] == "access"
+    assert state.userpool_keys.fetch_count == 0
+
+    ###########################################################################
+    # Test case: warm state is kept across invocations
+    assert authorizer.handler(event, None)["principalId"] == TEST_USERNAME
+    assert authorizer.warm_state() is state and state.token_cache.hits == 1
+
+    ###########################################################################
+    # Test case: REQUEST authorizer event
+    request_event = {"headers": {"authorization": mint_token(token_use="id")}, "methodArn": "arn"}
+    policy = authorizer.handler(request_event, None)
+    assert policy["context"]["token_use"] == "id" and policy["policyDocument"]["Statement"][0]["Resource"] == "arn"
+
+    ###########################################################################
+    # Test case: unauthorised
+    for event in [{}, {"authorizationToken": "garbage"}, {"authorizationToken": mint_token(expires_in=-1)}]:
+        with raises(Exception, match="^Unauthorized$"):
+            authorizer.handler(event, None)
+
+
+def test_snapshots(environ, tmp_path):
+    """Test the /tmp snapshot is persisted after a download and preferred on the next cold start
+    """
+    with JwksServer("test-kid-1") as server:
+        # The stand-in issuer differs from the Cognito one: point the provider at it
+        state = authorizer.AuthorizerState(server.userpool_iss, authorizer.JwksProvider(server.userpool_iss), None,
+                                           environ["COGNITO_JWKS_CACHE_PATH"])
+        assert state.userpool_keys.refresh() is True
+        authorizer.persist_keys(state)
+
+    keys, fresh = authorizer.load_snapshot(environ["COGNITO_JWKS_CACHE_PATH"], 60)
+    assert keys == jwks("test-kid-1")["keys"] and fresh is True
+
+    ###########################################################################
+    # Test case: cold start with the /tmp snapshot
+    state = authorizer.create_state(environ)
+    assert state.userpool_keys.fetch_count == 0 and state.userpool_keys.kids == ["test-kid-1"]
+    assert state.userpool_iss == TEST_ISS
+
+    ###########################################################################
+    # Test case: stale and missing snapshots
+    keys, fresh = authorizer.load_snapshot(environ["COGNITO_JWKS_CACHE_PATH"], 60, now=time.time() + 120)
+    assert keys is not None and fresh is False
+    assert authorizer.load_snapshot(str(tmp_path / "missing.json"), 60) == (None, False)
+    (tmp_path / "broken.json").write_text("{")
+    assert authorizer.load_snapshot(str(tmp_path / "broken.json"), 60) == (None, False)
+
+    ###########################################################################
+    # Test case: stale snapshot is kept when the download fails
+    authorizer.save_snapshot(environ["COGNITO_JWKS_CACHE_PATH"], jwks("test-kid-2")["keys"], now=0)
+    with JwksServer("test-kid-1", failure_rate=1) as server, \
+            patch.object(authorizer, "cognito_userpool_iss", return_value=server.userpool_iss):
+        state = authorizer.create_state(environ)
+        assert server.request_count == 1
+    assert state.userpool_keys.fetch_count == 1 and state.userpool_keys.kids == ["test-kid-2"]
+
+
+def test_undated_snapshot(environ, tmp_path):
+    """Test a bundled snapshot of unknown age is used for the first call and downloaded again in the background
+    """
+    bundled_path = tmp_path / "jwks.json"
+    bundled_path.write_text(json.dumps(jwks("test-kid-1")))
+    environ["COGNITO_JWKS_PATH"] = str(bundled_path)
+    assert authorizer.load_snapshot(str(bundled_path), 60) == (jwks("test-kid-1")["keys"], None)
+    for fetched_at in ["2026-10-01", None, True, float("nan"), float("inf"), {"at": 0}]:
+        (tmp_path / "dated.json").write_text(json.dumps(dict(jwks("test-kid-1"), fetched_at=fetched_at)))
+        assert authorizer.load_snapshot(str(tmp_path / "dated.json"), 60) == (jwks("test-kid-1")["keys"], None)
+    for fetched_at, fresh in [(10 ** 400, True), (-10 ** 400, False)]:
+        (tmp_path / "dated.json").write_text(json.dumps(dict(jwks("test-kid-1"), fetched_at=fetched_at)))
+        assert authorizer.load_snapshot(str(tmp_path / "dated.json"), 60)[1] is fresh
+
+    with JwksServer("test-kid-1", "test-kid-2", latency=0.2) as server, \
+            patch.object(authorizer, "cognito_userpool_iss", return_value=server.userpool_iss):
+        state = authorizer.create_state(environ)
+        # Served from the snapshot while the download is in flight
+        assert state.userpool_keys.kids == ["test-kid-1"] and state.userpool_keys.generation == 0
+        deadline = time.time() + 5
+        while state.userpool_keys.generation == 0 and time.time() < deadline:
+            time.sleep(0.01)
+    assert state.userpool_keys.kids == ["test-kid-1", "test-kid-2"]
+    authorizer.persist_keys(state)
+    assert authorizer.load_snapshot(environ["COGNITO_JWKS_CACHE_PATH"], 60)[1] is True
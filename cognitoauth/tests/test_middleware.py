@@ -0,0 +1,127 @@
+import asyncio
+from jose.utils import base64url_encode
+from mock import patch
+
+from cognitoauth.jwks import JwkSet
+from cognitoauth.middleware import CLAIMS_KEY, USERNAME_KEY, CognitoAuthASGIMiddleware, CognitoAuthWSGIMiddleware
+from cognitoauth.tests.tokens import TEST_ISS, TEST_REGION, TEST_USERNAME, TEST_USERPOOL_ID, jwks, mint_token
+import cognitoauth.token_verification as auth
+
+
+class KeysFactory(object):
+    def __init__(self):
+        self.userpool_isses = []
+
+    def __call__(self, userpool_iss):
+        self.userpool_isses.append(userpool_iss)
+        return JwkSet(jwks("test-kid-1")["keys"])
+
+
+def wsgi_app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [environ[USERNAME_KEY].encode("utf-8") if USERNAME_KEY in environ else b"public"]
+
+
+def call_wsgi(app, authorization=None, path="/"):
+    environ = {"PATH_INFO": path}
+    if authorization is not None:
+        environ["HTTP_AUTHORIZATION"] = authorization
+    responses = []
+    body = app(environ, lambda status, headers: responses.append((status, dict(headers))))
+    return responses[0][0], responses[0][1], b"".join(body), environ
+
+
+def test_wsgi_middleware():
+    """Test CognitoAuthWSGIMiddleware
+    """
+    keys_factory = KeysFactory()
+    app = CognitoAuthWSGIMiddleware(wsgi_app, TEST_REGION, TEST_USERPOOL_ID, keys_factory=keys_factory,
+                                    exempt_paths=["/health"])
+    token = mint_token()
+
+    ###########################################################################
+    # Test case: verified request gets the username and claims
+    for authorization in [token, auth.BEARER_PREFIX + token]:
+        status, headers, body, environ = call_wsgi(app, authorization)
+        assert status == "200 OK" and body == TEST_USERNAME.encode("utf-8")
+        assert environ[USERNAME_KEY] == TEST_USERNAME and environ[CLAIMS_KEY]["iss"] == TEST_ISS
+
+    ###########################################################################
+    # Test case: keys and cache are created once per worker process
+    assert keys_factory.userpool_isses == [TEST_ISS]
+    assert app.worker_state().token_cache.hits == 1
+    with patch("cognitoauth.middleware.os.getpid", return_value=-1):
+        assert call_wsgi(app, token)[0] == "200 OK"
+        assert len(keys_factory.userpool_isses) == 2
+        assert app.worker_state().token_cache.hits == 0
+
+    ###########################################################################
+    # Test case: unauthorised requests get a 401
+    unhashable_kid = ".".join([base64url_encode(b'{"alg": "RS256", "kid": [1]}').decode(),
+                               mint_token().split(".")[1], ""])
+    for authorization in [None, "", auth.BEARER_PREFIX, "garbage", mint_token(expires_in=-60),
+                          mint_token(username=None), unhashable_kid]:
+        # The error messages are not formatted on the way
+        with patch("cognitoauth.result.format_message", side_effect=AssertionError("message formatted")):
+            status, headers, body, environ = call_wsgi(app, authorization)
+        assert status == "401 Unauthorized"
+        assert headers["WWW-Authenticate"] == 'Bearer error="invalid_token"'
+        assert USERNAME_KEY not in environ
+
+    ###########################################################################
+    # Test case: exempt paths
+    assert call_wsgi(app, path="/health")[:3] == ("200 OK", {"Content-Type": "text/plain"}, b"public")
+
+
+def test_asgi_middleware():
+    """Test CognitoAuthASGIMiddleware
+    """
+    keys_factory = KeysFactory()
+    scopes = []
+
+    async def asgi_app(scope, receive, send):
+        scopes.append(scope)
+        if scope["type"] == "lifespan":
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    app = CognitoAuthASGIMiddleware(asgi_app, TEST_REGION, TEST_USERPOOL_ID, keys_factory=keys_factory)
+
+    def call_asgi(authorization=None, scope_type="http"):
+        headers = [(b"host", b"localhost")]
+        if authorization is not None:
+            headers.append((b"authorization", authorization.encode("latin-1")))
+        scope = {"type": scope_type, "path": "/", "headers": headers}
+        messages = []
+
+        async def receive():
+            return {"type": "http.request"}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(app(scope, receive, send))
+        return messages
+
+    ###########################################################################
+    # Test case: verified request gets the username and claims in its scope
+    messages = call_asgi(auth.BEARER_PREFIX + mint_token())
+    assert messages[0]["status"] == 200
+    assert scopes[-1][USERNAME_KEY] == TEST_USERNAME and scopes[-1][CLAIMS_KEY]["iss"] == TEST_ISS
+
+    ###########################################################################
+    # Test case: unauthorised requests get a 401, websockets are closed
+    for authorization in [None, "garbage", mint_token(expires_in=-60)]:
+        with patch("cognitoauth.result.format_message", side_effect=AssertionError("message formatted")):
+            messages = call_asgi(authorization)
+        assert messages[0]["status"] == 401
+        assert (b"www-authenticate", b'Bearer error="invalid_token"') in messages[0]["headers"]
+    assert call_asgi(scope_type="websocket") == [{"type": "websocket.close", "code": 1008}]
+    assert len(scopes) == 1
+
+    ###########################################################################
+    # Test case: other scopes are passed through
+    asyncio.run(app({"type": "lifespan"}, None, None))
+    assert scopes[-1] == {"type": "lifespan"}
+    assert keys_factory.userpool_isses == [TEST_ISS]
@@ -0,0 +1,78 @@
+from mock import Mock
+from pytest import raises
+
+from cognitoauth.cache import TokenCache
+from cognitoauth.jwks import JwkSet
+from cognitoauth.multipool import MultiPoolVerifier
+from cognitoauth.tests.tokens import TEST_REGION, TEST_USERNAME, jwks, mint_token
+import cognitoauth.token_verification as auth
+
+
+def test_multi_pool_verifier():
+    """Test MultiPoolVerifier
+    """
+    loaded = []
+
+    def keys_factory(userpool_iss):
+        loaded.append(userpool_iss)
+        return JwkSet(jwks("test-kid-2")["keys"])
+
+    verifier = MultiPoolVerifier(keys_factory=keys_factory)
+    for i in range(200):
+        verifier.register(TEST_REGION, "{}_Pool{}".format(TEST_REGION, i))
+    iss_1 = verifier.register(TEST_REGION, "{}_Tenant1".format(TEST_REGION), JwkSet(jwks("test-kid-1")["keys"]))
+    iss_2 = auth.cognito_userpool_iss(TEST_REGION, "{}_Pool2".format(TEST_REGION))
+    assert len(verifier) == 201 and iss_1 in verifier and iss_2 in verifier
+
+    ###########################################################################
+    # Test case: tokens are routed to the keys of their User Pool, loaded on first use
+    claims, username, msg = verifier.verify_token(mint_token(kid="test-kid-1", iss=iss_1))
+    assert msg is None and username == TEST_USERNAME and claims["iss"] == iss_1
+    assert loaded == []
+
+    token_2 = mint_token(kid="test-kid-2", iss=iss_2)
+    for _ in range(3):
+        claims, username, msg = verifier.verify_token(token_2)
+        assert msg is None and claims["iss"] == iss_2
+    assert loaded == [iss_2]
+
+    ###########################################################################
+    # Test case: token signed with the keys of another User Pool
+    claims, username, msg = verifier.verify_token(mint_token(kid="test-kid-1", iss=iss_2))
+    assert msg == "Obtained keys are wrong"
+
+    ###########################################################################
+    # Test case: token of an unregistered User Pool, or malformed
+    claims, username, msg = verifier.verify_token(mint_token(iss="https://example.com"))
+    assert msg == "Invalid issuer in token"
+    assert verifier.verify_token("garbage")[2].startswith("Failed to decode token")
+    assert len(loaded) == 1
+
+    verifier.unregister(iss_2)
+    assert verifier.verify_token(token_2)[2] == "Invalid issuer in token"
+
+    ###########################################################################
+    # Test case: authorise_request
+    mock_request = Mock()
+    mock_request.headers.get = Mock(return_value=mint_token(kid="test-kid-1", iss=iss_1))
+    assert verifier.authorise_request(mock_request) == TEST_USERNAME
+
+    mock_request.headers.get = Mock(return_value=token_2)
+    with raises(Exception, match="Token validation failed: Invalid issuer in token"):
+        verifier.authorise_request(mock_request)
+
+
+def test_multi_pool_verifier_with_token_cache():
+    """Test MultiPoolVerifier with a TokenCache
+    """
+    cache = TokenCache()
+    verifier = MultiPoolVerifier(token_cache=cache)
+    iss = verifier.register(TEST_REGION, "{}_Tenant1".format(TEST_REGION), JwkSet(jwks("test-kid-1")["keys"]))
+    token = mint_token(iss=iss)
+
+    assert verifier.verify_token(token)[1] == TEST_USERNAME
+    assert verifier.verify_token(token)[1] == TEST_USERNAME
+    assert cache.hits == 1
+
+    verifier.unregister(iss)
+    assert verifier.verify_token(token)[2] == "Invalid issuer in token"
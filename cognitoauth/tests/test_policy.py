@@ -0,0 +1,44 @@
+from cognitoauth.policy import PolicyDenial, PolicySet, Requirement
+
+
+def test_policy_set():
+    """Test PolicySet
+    """
+    policies = PolicySet({
+        "GET /orders": {"scopes": ["orders/read"]},
+        "POST /orders": Requirement(scopes=["orders/read", "orders/write"], groups=["staff", "admin"]),
+        "GET /admin": {"groups": ["admin"], "client_ids": ["admin-client"], "token_uses": ["id"]},
+        "GET /health": {},
+    }, max_cached_masks=2)
+    reader = {"token_use": "access", "client_id": "app-client", "scope": "openid orders/read"}
+    writer = dict(reader, scope="orders/write orders/read", **{"cognito:groups": ["staff"]})
+    admin = {"token_use": "id", "aud": "admin-client", "cognito:groups": ["admin"]}
+
+    ###########################################################################
+    # Test case: scopes are all required, groups any of
+    assert policies.allows("GET /orders", reader) and policies.allows("GET /orders", writer)
+    assert policies.check("POST /orders", reader) is PolicyDenial.INSUFFICIENT_SCOPE
+    assert policies.allows("POST /orders", writer)
+    assert policies.check("POST /orders", dict(writer, **{"cognito:groups": ["guest"]})) is \
+        PolicyDenial.GROUP_NOT_ALLOWED
+    assert policies.check("POST /orders", dict(writer, **{"cognito:groups": None})) is \
+        PolicyDenial.GROUP_NOT_ALLOWED
+    assert policies.check("GET /orders", {"token_use": "access"}) is PolicyDenial.INSUFFICIENT_SCOPE
+
+    ###########################################################################
+    # Test case: clients and token uses
+    assert policies.allows("GET /admin", admin)
+    assert policies.check("GET /admin", dict(admin, token_use="access")) is PolicyDenial.TOKEN_USE_NOT_ALLOWED
+    assert policies.check("GET /admin", dict(admin, aud="app-client")) is PolicyDenial.CLIENT_NOT_ALLOWED
+
+    ###########################################################################
+    # Test case: routes without requirement, unknown routes
+    assert policies.allows("GET /health", {})
+    assert policies.check("DELETE /orders", writer) is PolicyDenial.UNKNOWN_ROUTE
+    assert "GET /orders" in policies and len(policies) == 4
+
+    ###########################################################################
+    # Test case: the memoised masks are bounded
+    for i in range(5):
+        assert not policies.allows("POST /orders", dict(writer, scope="scope-{}".format(i)))
+    assert len(policies._scope_masks) <= 2
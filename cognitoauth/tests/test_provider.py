@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+from pytest import fixture
+import time
+
+import cognitoauth.token_verification as auth
+from cognitoauth.provider import JwksProvider
+from cognitoauth.tests.jwks_server import JwksServer
+from cognitoauth.tests.tokens import TEST_USERNAME, jwks, mint_token
+
+
+@fixture
+def jwks_server():
+    with JwksServer("test-kid-1") as server:
+        yield server
+
+
+class FakeTimer(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_cognito_userpool_keys(jwks_server):
+    """Test cognito_userpool_keys against the local stand-in
+    """
+    assert auth.cognito_userpool_keys(jwks_server.userpool_iss) == jwks("test-kid-1")["keys"]
+
+    # Test case: download failed
+    assert auth.cognito_userpool_keys(jwks_server.userpool_iss + "-unknown") is None
+
+
+def test_jwks_provider(jwks_server):
+    """Test JwksProvider
+    """
+    timer = FakeTimer(1000)
+    provider = JwksProvider(jwks_server.userpool_iss, min_refetch_interval=30, timer=timer)
+
+    ###########################################################################
+    # Test case: keys are downloaded on first use, then served from memory
+    assert provider.get_key("test-kid-1") is not None
+    assert provider.get_key("test-kid-1") is not None
+    assert jwks_server.request_count == 1
+    assert provider.kids == ["test-kid-1"]
+
+    ###########################################################################
+    # Test case: unknown kid within min_refetch_interval does not download
+    timer.now += 10
+    assert provider.get_key("test-kid-2") is None
+    assert jwks_server.request_count == 1
+
+    ###########################################################################
+    # Test case: keys rotated, unknown kid triggers a single refetch shared by concurrent callers
+    jwks_server.set_kids("test-kid-1", "test-kid-2")
+    timer.now += 30
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        keys = list(executor.map(provider.get_key, ["test-kid-2"] * 64))
+    assert all(key is not None for key in keys)
+    assert jwks_server.request_count == 2
+
+    ###########################################################################
+    # Test case: kid that does not exist at all is refetched at most once per interval
+    for _ in range(10):
+        assert provider.get_key("test-kid-3") is None
+    assert jwks_server.request_count == 2
+    timer.now += 30
+    assert provider.get_key("test-kid-3") is None
+    assert jwks_server.request_count == 3
+
+    ###########################################################################
+    # Test case: failed download keeps the current keys
+    provider.userpool_iss += "-unknown"
+    assert provider.refresh() is False
+    assert provider.fetch_failures == 1
+    assert provider.get_key("test-kid-2") is not None
+
+
+def test_jwks_provider_background_refresh(jwks_server):
+    """Test JwksProvider refreshing in the background
+    """
+    provider = JwksProvider(jwks_server.userpool_iss, refresh_interval=0.05)
+    provider.start()
+    try:
+        jwks_server.set_kids("test-kid-2")
+        for _ in range(100):
+            if "test-kid-2" in provider:
+                break
+            time.sleep(0.05)
+        assert provider.kids == ["test-kid-2"]
+    finally:
+        provider.stop()
+
+
+def test_validate_jwt_with_jwks_provider(jwks_server):
+    """Test validate_jwt with a JwksProvider across a key rotation
+    """
+    iss = jwks_server.userpool_iss
+    provider = JwksProvider(iss, min_refetch_interval=0)
+
+    passed, msg = auth.validate_jwt(mint_token(kid="test-kid-1", iss=iss), iss, provider)
+    assert passed is True and msg is None
+
+    jwks_server.set_kids("test-kid-2")
+    claims, username, msg = auth.verify_token(mint_token(kid="test-kid-2", iss=iss), iss, provider)
+    assert msg is None and username == TEST_USERNAME
+    assert jwks_server.request_count == 2
@@ -0,0 +1,81 @@
+from mock import Mock, patch
+from pytest import raises
+
+import cognitoauth.token_verification as auth
+from cognitoauth.jwks import JwkSet
+from cognitoauth.reasons import FailureReason
+from cognitoauth.result import VerificationResult
+from cognitoauth.tests.tokens import TEST_ISS, TEST_REGION, TEST_USERNAME, TEST_USERPOOL_ID, jwks, mint_token
+
+
+def request_with(authorization):
+    mock_request = Mock()
+    mock_request.headers.get = Mock(return_value=authorization)
+    return mock_request
+
+
+def test_verification_result():
+    """Test VerificationResult
+    """
+    ###########################################################################
+    # Test case: verified
+    result = VerificationResult({"username": TEST_USERNAME}, TEST_USERNAME)
+    assert result and result.ok and result.reason is None and result.message is None
+    assert result.as_tuple() == ({"username": TEST_USERNAME}, TEST_USERNAME, None)
+    with raises(AttributeError):
+        result.username = "other"
+    with raises(AttributeError):
+        result.other = "other"
+
+    ###########################################################################
+    # Test case: rejections without detail are shared, messages are formatted when read
+    assert VerificationResult.rejected(FailureReason.UNKNOWN_KID) is VerificationResult.rejected(FailureReason.UNKNOWN_KID)
+    with patch("cognitoauth.result.format_message", return_value="message") as mock_format:
+        result = VerificationResult.rejected(FailureReason.EXPIRED, 60)
+        assert not result and result.reason is FailureReason.EXPIRED and result.claims is None
+        assert mock_format.call_count == 0
+        assert result.message == "message"
+        mock_format.assert_called_once_with(FailureReason.EXPIRED, 60)
+    assert result.as_tuple() == (None, None, "Token has expired 0:01:00")
+
+
+def test_verify_token_result():
+    """Test verify_token_result
+    """
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+
+    result = auth.verify_token_result(mint_token(), TEST_ISS, key_set)
+    assert result and result.username == TEST_USERNAME and result.claims["token_use"] == "access"
+
+    for token, reason in [(mint_token(kid="test-kid-2"), FailureReason.UNKNOWN_KID),
+                          (mint_token(expires_in=-60), FailureReason.EXPIRED),
+                          ("garbage", FailureReason.MALFORMED)]:
+        with patch("cognitoauth.result.format_message") as mock_format:
+            result = auth.verify_token_result(token, TEST_ISS, key_set)
+            assert not result and result.reason is reason
+            assert mock_format.call_count == 0
+
+
+def test_authorise_request_result():
+    """Test authorise_request_result
+    """
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+
+    ###########################################################################
+    # Test case: authorised
+    result = auth.authorise_request_result(request_with(mint_token()), TEST_REGION, TEST_USERPOOL_ID, key_set)
+    assert result and result.username == TEST_USERNAME
+
+    ###########################################################################
+    # Test case: rejected without raising, with the messages of authorise_request
+    cases = [
+        (None, FailureReason.NO_TOKEN, "No token found in header"),
+        (mint_token(username=None), FailureReason.MISSING_USERNAME, "Username not found in token"),
+        (mint_token(kid="test-kid-2"), FailureReason.UNKNOWN_KID, "Obtained keys are wrong"),
+    ]
+    for authorization, reason, message in cases:
+        result = auth.authorise_request_result(request_with(authorization), TEST_REGION, TEST_USERPOOL_ID, key_set)
+        assert not result and result.reason is reason and result.message == message
+        with raises(Exception) as e:
+            auth.authorise_request(request_with(authorization), TEST_REGION, TEST_USERPOOL_ID, key_set)
+        assert message in str(e.value)
@@ -0,0 +1,117 @@
+import json
+import time
+from mock import patch
+from pytest import raises
+
+import cognitoauth.token_verification as auth
+from cognitoauth.cache import TokenCache
+from cognitoauth.jwks import JwkSet
+from cognitoauth.revocation import FileSource, RevocationList
+from cognitoauth.tests.test_cache import FakeTimer
+from cognitoauth.tests.tokens import TEST_ISS, TEST_USERNAME, jwks, mint_token
+
+
+def test_revocation_list():
+    """Test RevocationList
+    """
+    timer = FakeTimer(1000)
+    revocation_list = RevocationList(max_token_lifetime=100, timer=timer)
+
+    ###########################################################################
+    # Test case: revoked jti
+    revocation_list.revoke_jti("jti-1", exp=1100)
+    assert revocation_list.is_revoked({"jti": "jti-1", "sub": "sub-1", "iat": 900})
+    assert not revocation_list.is_revoked({"jti": "jti-2", "sub": "sub-1", "iat": 900})
+    assert not revocation_list.is_revoked({})
+
+    ###########################################################################
+    # Test case: signed out sub revokes the tokens issued up to the sign-out
+    revocation_list.revoke_sub("sub-1")
+    assert revocation_list.is_revoked({"jti": "jti-2", "sub": "sub-1", "iat": 1000})
+    assert not revocation_list.is_revoked({"jti": "jti-3", "sub": "sub-1", "iat": 1001})
+
+    ###########################################################################
+    # Test case: updates
+    added = revocation_list.update([{"jti": "jti-{}".format(i), "exp": 1200} for i in range(10, 20)] +
+                                   [{"sub": "sub-2", "revoked_at": 1050, "exp": 1300}, {"sub": None}, "garbage"])
+    assert added == 11 and len(revocation_list) == 13
+    assert all(revocation_list.is_revoked({"jti": "jti-{}".format(i)}) for i in range(10, 20))
+    assert revocation_list.is_revoked({"sub": "sub-2", "iat": 1050})
+
+    ###########################################################################
+    # Test case: times which are not numbers are invalid entries
+    assert revocation_list.update([{"jti": "jti-30", "exp": "2026-10-17"}, {"sub": "sub-3", "revoked_at": "now"},
+                                   {"sub": "sub-3", "exp": [1300]}, {"jti": "jti-30", "exp": None}]) == 0
+    assert len(revocation_list) == 13 and not revocation_list.is_revoked({"jti": "jti-30"})
+    with raises(TypeError):
+        revocation_list.revoke_jti("jti-30", "2026-10-17")
+
+    ###########################################################################
+    # Test case: entries are dropped once the tokens they revoke have expired
+    timer.now = 1150
+    assert revocation_list.prune() == 2
+    assert not revocation_list.is_revoked({"jti": "jti-1"})
+    assert not revocation_list.is_revoked({"sub": "sub-1", "iat": 1000})
+    timer.now = 1300
+    assert revocation_list.prune() == 11 and len(revocation_list) == 0
+
+
+def test_file_source(tmp_path):
+    """Test RevocationList updated from a JSON lines file
+    """
+    path = tmp_path / "revocations.jsonl"
+    revocation_list = RevocationList(source=FileSource(str(path)))
+
+    ###########################################################################
+    # Test case: missing file, then lines appended incrementally
+    assert revocation_list.refresh() == 0
+    with open(str(path), "a") as f:
+        f.write(json.dumps({"jti": "jti-1", "exp": 2 ** 40}) + "\n\nnot json\n")
+        f.write(json.dumps({"jti": "jti-2", "exp": 2 ** 40}))
+    assert revocation_list.refresh() == 1
+    with open(str(path), "a") as f:
+        f.write("\n" + json.dumps({"sub": "sub-1"}) + "\n")
+    assert revocation_list.refresh() == 2
+    assert revocation_list.is_revoked({"jti": "jti-2"}) and revocation_list.is_revoked({"sub": "sub-1", "iat": 0})
+
+    ###########################################################################
+    # Test case: replaced file is read from its start
+    path.write_text(json.dumps({"jti": "jti-3", "exp": 2 ** 40}) + "\n")
+    assert revocation_list.refresh() == 1 and revocation_list.is_revoked({"jti": "jti-3"})
+
+    ###########################################################################
+    # Test case: background refresh goes on after a failure
+    revocation_list.refresh_interval = 0.01
+    revocation_list.start()
+    with patch.object(revocation_list, "prune", side_effect=[RuntimeError("prune failed"), 0, 0, 0]):
+        with open(str(path), "a") as f:
+            f.write(json.dumps({"jti": "jti-4", "exp": 2 ** 40}) + "\n")
+        for _ in range(200):
+            if revocation_list.is_revoked({"jti": "jti-4"}):
+                break
+            time.sleep(0.01)
+        assert revocation_list._thread.is_alive()
+    revocation_list.stop()
+    assert revocation_list.is_revoked({"jti": "jti-4"})
+
+
+def test_verify_revoked_token():
+    """Test verify_token with a RevocationList
+    """
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+    token_cache = TokenCache()
+    revocation_list = RevocationList()
+    token = mint_token(jti="jti-1")
+
+    ###########################################################################
+    # Test case: valid until revoked, even if cached
+    claims, username, err_msg = auth.verify_token(token, TEST_ISS, key_set, token_cache, revocation_list=revocation_list)
+    assert username == TEST_USERNAME and err_msg is None
+
+    revocation_list.revoke_jti("jti-1", claims["exp"])
+    assert auth.verify_token(token, TEST_ISS, key_set, token_cache, revocation_list=revocation_list) == \
+        (None, None, "Token has been revoked")
+    assert auth.validate_jwt(token, TEST_ISS, key_set, revocation_list=revocation_list) == \
+        (False, "Token has been revoked")
+    assert auth.validate_jwt(mint_token(jti="jti-2"), TEST_ISS, key_set, revocation_list=revocation_list) == \
+        (True, None)
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+from pytest import raises, skip
+
+import cognitoauth.token_verification as auth
+from cognitoauth.jwks import JwkSet
+from cognitoauth.shared_cache import SharedTokenCache, default_cache_dir
+from cognitoauth.tests.test_cache import FakeTimer
+from cognitoauth.tests.tokens import TEST_ISS, TEST_USERNAME, jwks, mint_token
+
+
+def _put_tokens(path, first, count):
+    cache = SharedTokenCache(path, buckets=16, ways=4)
+    for i in range(first, first + count):
+        cache.put("token-{}".format(i), "user-{}".format(i), {"exp": 2 ** 40, "i": i})
+        assert cache.get("token-{}".format(i - 1)) in (None, ("user-{}".format(i - 1), {"exp": 2 ** 40, "i": i - 1}))
+    cache.close()
+
+
+def test_shared_token_cache(tmp_path):
+    """Test SharedTokenCache
+    """
+    path = str(tmp_path / "tokens")
+    timer = FakeTimer(1000)
+    cache = SharedTokenCache(path, buckets=1, ways=2, timer=timer)
+
+    ###########################################################################
+    # Test case: miss then hit
+    assert cache.get("token-a") is None
+    cache.put("token-a", "user-a", {"exp": 2000})
+    assert cache.get("token-a") == ("user-a", {"exp": 2000})
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    ###########################################################################
+    # Test case: a full bucket evicts the entry expiring first
+    cache.put("token-b", "user-b", {"exp": 3000})
+    cache.put("token-c", "user-c", {"exp": 4000})
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.get("token-a") is None
+    assert cache.get("token-b") is not None and cache.get("token-c") is not None
+
+    ###########################################################################
+    # Test case: entries do not outlive the exp claim, and expired slots are reused first
+    timer.now = 3000
+    assert cache.get("token-b") is None
+    assert cache.expirations == 1
+    cache.put("token-d", "user-d", {"exp": 5000})
+    assert cache.evictions == 1 and len(cache) == 2
+
+    ###########################################################################
+    # Test case: claims larger than a slot are not cached
+    cache.put("token-e", "user-e", {"exp": 5000, "groups": ["group"] * 1000})
+    assert cache.get("token-e") is None
+
+    ###########################################################################
+    # Test case: another process sees the same entries; a different layout is refused
+    other = SharedTokenCache(path, buckets=1, ways=2, timer=timer)
+    assert other.get("token-d") == ("user-d", {"exp": 5000})
+    with raises(ValueError):
+        SharedTokenCache(path, buckets=2, ways=2)
+
+    ###########################################################################
+    # Test case: clear
+    cache.clear()
+    assert other.get("token-d") is None and cache.stats()["size"] == 0
+    cache.close()
+    other.close()
+
+
+def test_shared_token_cache_across_processes(tmp_path):
+    """Test SharedTokenCache written concurrently by several processes
+    """
+    path = str(tmp_path / "tokens")
+    cache = SharedTokenCache(path, buckets=16, ways=4)
+    processes = [multiprocessing.Process(target=_put_tokens, args=(path, 100 * i, 40)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    cached = [cache.get("token-{}".format(100 * i + j)) for i in range(4) for j in range(40)]
+    assert 0 < len(cache) <= 64
+    assert all(entry is None or entry[1]["i"] == int(entry[0].split("-")[1]) for entry in cached)
+    cache.close()
+
+
+def test_shared_token_cache_refuses_unsafe_files(tmp_path):
+    """Test that SharedTokenCache refuses cache files other users could have written
+    """
+    ###########################################################################
+    # Test case: a file writable by others is refused
+    path = str(tmp_path / "world-writable")
+    SharedTokenCache(path, buckets=1, ways=1).close()
+    os.chmod(path, 0o666)
+    with raises(ValueError):
+        SharedTokenCache(path, buckets=1, ways=1)
+
+    ###########################################################################
+    # Test case: a symlink is not followed
+    target = str(tmp_path / "target")
+    SharedTokenCache(target, buckets=1, ways=1).close()
+    link = str(tmp_path / "link")
+    os.symlink(target, link)
+    with raises(OSError):
+        SharedTokenCache(link, buckets=1, ways=1)
+
+    ###########################################################################
+    # Test case: the default file is in a directory private to the current user
+    cache = SharedTokenCache(buckets=1, ways=1)
+    assert os.path.dirname(cache.path) == default_cache_dir()
+    assert os.stat(default_cache_dir()).st_mode & 0o777 == 0o700
+    assert os.stat(cache.path).st_mode & 0o777 == 0o600
+    cache.close()
+    os.remove(cache.path)
+
+
+def test_shared_token_cache_refuses_foreign_files(tmp_path):
+    """Test that SharedTokenCache refuses a cache file owned by another user
+    """
+    if os.geteuid() != 0:
+        skip("Changing the owner of a file requires root")
+    path = str(tmp_path / "foreign")
+    SharedTokenCache(path, buckets=1, ways=1).close()
+    os.chown(path, 12345, 12345)
+    with raises(ValueError):
+        SharedTokenCache(path, buckets=1, ways=1)
+
+
+def test_validate_jwt_with_shared_token_cache(tmp_path):
+    """Test validate_jwt with a SharedTokenCache
+    """
+    key_set = JwkSet(jwks("test-kid-1")["keys"])
+    path = str(tmp_path / "tokens")
+    token = mint_token()
+
+    ###########################################################################
+    # Test case: a token verified by one worker is a hit for the others
+    assert auth.validate_jwt(token, TEST_ISS, key_set, SharedTokenCache(path)) == (True, None)
+    cache = SharedTokenCache(path)
+    claims, username, err_msg = auth.verify_token(token, TEST_ISS, [], cache)
+    assert username == TEST_USERNAME and err_msg is None and cache.hits == 1
+    assert os.path.getsize(path) > 4096 * 8 * 1024
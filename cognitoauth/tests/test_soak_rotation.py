@@ -0,0 +1,60 @@
+from cognitoauth.provider import JwksProvider
+from cognitoauth.tests.soak import _percentile_ms, percentile, rotation_phases, run_soak, static_keys_factory
+
+PHASE_DURATION = 0.3
+
+
+def provider_factory(userpool_iss):
+    # Rotations happen long after the first download: scale the refetch rate limit down with the phases
+    return JwksProvider(userpool_iss, min_refetch_interval=PHASE_DURATION / 10)
+
+
+def by_phase(reports):
+    return {report["phase"]: report for report in reports}
+
+
+def test_percentile_ms():
+    """Test the nearest rank percentiles of the reports
+    """
+    durations = [0.001, 0.002, 0.003, 0.004, 0.005, 0.006]
+    assert _percentile_ms(durations, 50) == 3.0
+    assert _percentile_ms(durations, 99) == 6.0
+    assert _percentile_ms(durations, 100) == 6.0
+    assert _percentile_ms(durations, 0) == 1.0
+    assert _percentile_ms([0.001, 0.002, 0.003, 0.004, 0.005], 50) == 3.0
+    assert _percentile_ms([0.007], 99) == 7.0
+    assert _percentile_ms([], 50) is None
+    assert percentile([1, 2, 3, 4, 5, 6], 50) == 3
+    assert percentile(list(range(1, 101)), 99) == 99
+
+
+def test_rotation_with_jwks_provider():
+    """Test a JwksProvider serves the tokens of a new key without errors, during and after the rotation
+    """
+    reports = by_phase(run_soak(rotation_phases(PHASE_DURATION), provider_factory))
+    for name in ["before", "during", "after"]:
+        assert reports[name]["requests"] > 0
+        assert reports[name]["errors"] == 0, reports[name]
+        assert reports[name]["p99_ms"] is not None
+    # The new kid is downloaded once
+    assert reports["during"]["jwks_requests"] == 1 and reports["after"]["jwks_requests"] == 0
+
+
+def test_rotation_with_faulty_jwks_endpoint():
+    """Test a JwksProvider recovers when the JWT Set endpoint is slow and failing during the rotation
+    """
+    phases = rotation_phases(PHASE_DURATION, latency=0.02, failure_rate=0.5)
+    reports = by_phase(run_soak(phases, provider_factory))
+    assert reports["before"]["errors"] == 0
+    assert set(reports["during"]["errors_by_message"]) <= {"Token validation failed: Obtained keys are wrong"}
+    assert reports["after"]["errors"] == 0, reports["after"]
+
+
+def test_rotation_with_static_keys():
+    """Test keys downloaded once reject the tokens of the new key, as seen in production
+    """
+    reports = by_phase(run_soak(rotation_phases(PHASE_DURATION), static_keys_factory))
+    assert reports["before"]["errors"] == 0
+    assert 0 < reports["during"]["error_rate"] < 1
+    assert reports["after"]["error_rate"] == 1
+    assert list(reports["after"]["errors_by_message"]) == ["Token validation failed: Obtained keys are wrong"]
@@ -1,10 +1,15 @@
-from jose import jwt, jwk
+import time
+
+from jose import jwt
+from jose.utils import base64url_encode
 from mock import Mock, patch
 from pytest import raises
 from pytz import datetime, timezone, utc
-from time import mktime
 
+from cognitoauth.jwks import JwkSet
+from cognitoauth.reasons import FailureReason, format_message
 import cognitoauth.token_verification as auth
+from cognitoauth.tests.tokens import TEST_ISS, TEST_REGION, TEST_USERPOOL_ID, jwks, mint_token
 
 # Sample username
 SAMPLE_USERNAME = "virtualda+testuser1@gmail.com"
@@ -25,48 +30,26 @@ def test_authorise_request(cognito_settings):
     region = cognito_settings["cognito.region"]
     userpool_id = cognito_settings["cognito.userpool.id"]
     userpool_iss = auth.cognito_userpool_iss(region, userpool_id)
-    userpool_keys = [{"kid": "test_kid"}]
+    userpool_keys = jwks("test-kid-1")["keys"]
 
     mock_request = Mock()
-    mock_request.headers.get = Mock(return_value=ACCESS_TOKEN_EXPIRED)
 
     ###########################################################################
     # Test case: user id not found in the token
-
-    with raises(Exception), patch("jose.jwt.get_unverified_claims") as mock_jwt:
-        mock_jwt.return_value = {"token_use": "none"}
+    mock_request.headers.get = Mock(return_value=mint_token(iss=userpool_iss, username=None))
+    with raises(Exception, match="Username not found in token"):
         auth.authorise_request(mock_request, region, userpool_id, userpool_keys)
 
     ###########################################################################
     # Test case: invalid token
-    with raises(Exception):
+    mock_request.headers.get = Mock(return_value=ACCESS_TOKEN_EXPIRED)
+    with raises(Exception, match="Token validation failed"):
         auth.authorise_request(mock_request, region, userpool_id, userpool_keys)
 
     ###########################################################################
     # Test case: valid token
-
-    with patch("jose.jwt.get_unverified_header") as mock_header,\
-            patch("jose.jwt.get_unverified_claims") as mock_claims,\
-            patch("jose.jwt.decode") as mock_decode,\
-            patch("jose.jws.verify") as mock_verify:
-        userpool_keys = [{"kid": "test_kid"}]
-        dt = datetime.datetime.utcnow() + datetime.timedelta(days=1)
-        future_timestamp = mktime(dt.timetuple())
-
-        mock_header.return_value = {
-            "kid": "test_kid",
-            "alg": ""
-        }
-        mock_claims.return_value = {
-            "iss": userpool_iss,
-            "token_use": "access",
-            "exp": future_timestamp,
-            "username": SAMPLE_USERNAME
-        }
-        mock_decode.return_value = True
-        mock_verify.return_value = True
-
-        assert auth.authorise_request(mock_request, region, userpool_id, userpool_keys) == SAMPLE_USERNAME
+    mock_request.headers.get = Mock(return_value=mint_token(iss=userpool_iss, username=SAMPLE_USERNAME))
+    assert auth.authorise_request(mock_request, region, userpool_id, userpool_keys) == SAMPLE_USERNAME
 
 
 def test_retrieve_header_token():
@@ -133,100 +116,160 @@ def validate_jwt_with_real_token(cognito_settings):
 
     passed, msg = auth.validate_jwt(ACCESS_TOKEN_EXPIRED, userpool_iss, userpool_keys)
     assert passed is False
-    assert msg == "Failed to decode token: Signature has expired."
+    assert msg.startswith("Token has expired")
 
 
-def test_validate_jwt_with_mock(cognito_settings):
+def test_validate_jwt_with_local_token():
     """Test validate_jwt
     """
-    region = cognito_settings["cognito.region"]
-    userpool_id = cognito_settings["cognito.userpool.id"]
-    userpool_iss = auth.cognito_userpool_iss(region, userpool_id)
+    userpool_iss = TEST_ISS
+    userpool_keys = jwks("test-kid-1", "test-kid-2")["keys"]
 
     ###########################################################################
     # Test case: passed all
-    with patch("jose.jwt.get_unverified_header") as mock_header,\
-            patch("jose.jwt.get_unverified_claims") as mock_claims,\
-            patch("jose.jwt.decode") as mock_decode,\
-            patch("jose.jws.verify") as mock_verify:
-        userpool_keys = [{"kid": "test_kid"}]
-        dt = datetime.datetime.utcnow() + datetime.timedelta(days=1)
-        future_timestamp = mktime(dt.timetuple())
-
-        mock_header.return_value = {"kid": "test_kid", "alg": ""}
-        mock_claims.return_value = {"iss": userpool_iss, "token_use": "access", "exp": future_timestamp}
-        mock_decode.return_value = True
-        mock_verify.return_value = True
-
-        passed, msg = auth.validate_jwt(ACCESS_TOKEN_EXPIRED, userpool_iss, userpool_keys)
+    for token_use in ["access", "id"]:
+        token = mint_token(iss=userpool_iss, token_use=token_use)
+        passed, msg = auth.validate_jwt(token, userpool_iss, userpool_keys)
         assert passed is True and msg is None
 
     ###########################################################################
     # Test case: failed: Obtained keys are wrong
-    with patch("jose.jwt.get_unverified_header") as mock_header:
-        mock_header.return_value = {"kid": "", "alg": ""}
-        passed, msg = auth.validate_jwt(ACCESS_TOKEN_EXPIRED, userpool_iss, userpool_keys)
-        assert passed is False and msg == "Obtained keys are wrong"
+    passed, msg = auth.validate_jwt(mint_token(kid="test-kid-3", iss=userpool_iss), userpool_iss, userpool_keys)
+    assert passed is False and msg == "Obtained keys are wrong"
+
+    passed, msg = auth.validate_jwt(mint_token(iss=userpool_iss), userpool_iss, None)
+    assert passed is False and msg == "Obtained keys are wrong"
 
     ###########################################################################
     # Test case: failed: Failed to decode token
-    with patch("jose.jwt.get_unverified_header") as mock_header:
-        userpool_keys = [{"kid": "test_kid"}]
-        mock_header.return_value = {"kid": "test_kid", "alg": ""}
-        passed, msg = auth.validate_jwt(ACCESS_TOKEN_EXPIRED, userpool_iss, userpool_keys)
+    for token in ["", "not-a-token", "a.b.c", ACCESS_TOKEN_EXPIRED[20:]]:
+        passed, msg = auth.validate_jwt(token, userpool_iss, userpool_keys)
         assert passed is False and msg.startswith("Failed to decode token")
 
     ###########################################################################
     # Test case: failed: Invalid issuer in token
-    with patch("jose.jwt.get_unverified_header") as mock_header, \
-            patch("jose.jwt.get_unverified_claims") as mock_claims, \
-            patch("jose.jwt.decode") as mock_decode:
-        userpool_keys = [{"kid": "test_kid"}]
-        mock_header.return_value = {"kid": "test_kid", "alg": ""}
-        mock_claims.return_value = {"iss": "", "token_use": "access", "exp": future_timestamp}
-        mock_decode.return_value = True
-        passed, msg = auth.validate_jwt(ACCESS_TOKEN_EXPIRED, userpool_iss, userpool_keys)
-        assert passed is False and msg == "Invalid issuer in token"
+    passed, msg = auth.validate_jwt(mint_token(iss="https://example.com"), userpool_iss, userpool_keys)
+    assert passed is False and msg == "Invalid issuer in token"
 
     ###########################################################################
     # Test case: failed: Token not of valid use
-    with patch("jose.jwt.get_unverified_header") as mock_header,\
-            patch("jose.jwt.get_unverified_claims") as mock_claims,\
-            patch("jose.jwt.decode") as mock_decode:
-        userpool_keys = [{"kid": "test_kid"}]
-        mock_header.return_value = {"kid": "test_kid", "alg": ""}
-        mock_claims.return_value = {"iss": userpool_iss, "token_use": "", "exp": future_timestamp}
-        mock_decode.return_value = True
-        passed, msg = auth.validate_jwt(ACCESS_TOKEN_EXPIRED, userpool_iss, userpool_keys)
-        assert passed is False and msg == "Token not of valid use"
+    passed, msg = auth.validate_jwt(mint_token(iss=userpool_iss, token_use="refresh"), userpool_iss, userpool_keys)
+    assert passed is False and msg == "Token not of valid use"
 
     ###########################################################################
     # Test case: failed: Failed to verify signature
-    with patch("jose.jwt.get_unverified_header") as mock_header,\
-            patch("jose.jwt.get_unverified_claims") as mock_claims,\
-            patch("jose.jwt.decode") as mock_decode:
-        userpool_keys = [{"kid": "test_kid"}]
-        mock_header.return_value = {"kid": "test_kid", "alg": ""}
-        mock_claims.return_value = {"iss": userpool_iss, "token_use": "access", "exp": future_timestamp}
-        mock_decode.return_value = True
-        passed, msg = auth.validate_jwt(ACCESS_TOKEN_EXPIRED, userpool_iss, userpool_keys)
-        assert passed is False and msg.startswith("Failed to verify signature")
+    token = mint_token(iss=userpool_iss, signing_kid="test-kid-2")
+    passed, msg = auth.validate_jwt(token, userpool_iss, userpool_keys)
+    assert passed is False and msg.startswith("Failed to verify signature")
+
+    header, claims, signature = mint_token(iss=userpool_iss).split(".")
+    tampered_claims = mint_token(iss=userpool_iss, username="someone.else").split(".")[1]
+    passed, msg = auth.validate_jwt(".".join([header, tampered_claims, signature]), userpool_iss, userpool_keys)
+    assert passed is False and msg.startswith("Failed to verify signature")
 
     ###########################################################################
     # Test case: failed: Token has expired
-    with patch("jose.jwt.get_unverified_header") as mock_header,\
-            patch("jose.jwt.get_unverified_claims") as mock_claims,\
-            patch("jose.jwt.decode") as mock_decode,\
-            patch("jose.jws.verify") as mock_verify:
-        userpool_keys = [{"kid": "test_kid"}]
-        dt = datetime.datetime.utcnow() + datetime.timedelta(days=-1)
-        future_timestamp = mktime(dt.timetuple())
-        mock_header.return_value = {"kid": "test_kid", "alg": ""}
-        mock_claims.return_value = {"iss": userpool_iss, "token_use": "access", "exp": future_timestamp}
-        mock_decode.return_value = True
-        mock_verify.return_value = True
-        passed, msg = auth.validate_jwt(ACCESS_TOKEN_EXPIRED, userpool_iss, userpool_keys)
-        assert passed is False and msg.startswith("Token has expired")
+    passed, msg = auth.validate_jwt(mint_token(iss=userpool_iss, expires_in=-60), userpool_iss, userpool_keys)
+    assert passed is False and msg.startswith("Token has expired")
+
+
+def test_verify_token():
+    """Test verify_token
+    """
+    userpool_iss = TEST_ISS
+    userpool_keys = jwks("test-kid-1")["keys"]
+
+    ###########################################################################
+    # Test case: verified claims and username are returned together
+    for token_use in ["access", "id"]:
+        token = mint_token(iss=userpool_iss, token_use=token_use, username=SAMPLE_USERNAME)
+        claims, username, msg = auth.verify_token(token, userpool_iss, userpool_keys)
+        assert msg is None
+        assert username == SAMPLE_USERNAME
+        assert claims["token_use"] == token_use and claims["iss"] == userpool_iss
+
+    ###########################################################################
+    # Test case: nothing is returned but the error on failure
+    claims, username, msg = auth.verify_token(mint_token(iss=userpool_iss, expires_in=-1), userpool_iss, userpool_keys)
+    assert claims is None and username is None and msg.startswith("Token has expired")
+
+    ###########################################################################
+    # Test case: verified at a given time, a token issued or valid after it is rejected
+    token = mint_token(iss=userpool_iss, username=SAMPLE_USERNAME)
+    _, username, msg = auth.verify_token(token, userpool_iss, userpool_keys, now=time.time() - 30 * 86400)
+    assert username is None and msg.startswith("Token is not valid until")
+    _, username, msg = auth.verify_token(token, userpool_iss, userpool_keys, now=time.time() - 30)
+    assert username == SAMPLE_USERNAME and msg is None
+    token = mint_token(iss=userpool_iss, nbf=int(time.time()) + 600)
+    _, username, msg = auth.verify_token(token, userpool_iss, userpool_keys, now=time.time())
+    assert username is None and msg.startswith("Token is not valid until")
+
+
+def test_reject_before_signature():
+    """Test tokens which would fail anyway are rejected before any key lookup or signature check
+    """
+    userpool_iss = TEST_ISS
+    userpool_keys = jwks("test-kid-1")["keys"]
+
+    header, claims, signature = mint_token(iss=userpool_iss).split(".")
+    alg_none_header = base64url_encode(b'{"alg": "none", "kid": "test-kid-1"}').decode()
+    hs256_header = base64url_encode(b'{"alg": "HS256", "kid": "test-kid-1"}').decode()
+    rejected = [
+        ("x" * (auth.MAX_TOKEN_LENGTH + 1), "Failed to decode token: Token is larger than"),
+        (".".join([header, claims, signature, signature]), "Failed to decode token: Token must have 3 segments"),
+        (".".join([header, "%%%", signature]), "Failed to decode token"),
+        (".".join([alg_none_header, claims, ""]), "Failed to verify signature: algorithm none is not allowed"),
+        (".".join([hs256_header, claims, signature]), "Failed to verify signature: algorithm HS256 is not allowed"),
+        (mint_token(iss="https://example.com"), "Invalid issuer in token"),
+        (mint_token(iss=userpool_iss, token_use="refresh"), "Token not of valid use"),
+        (mint_token(iss=userpool_iss, exp="tomorrow"), "Token has no valid expiry"),
+        (mint_token(iss=userpool_iss, exp=True), "Token has no valid expiry"),
+        (mint_token(iss=userpool_iss, exp=-1e300), "Token has no valid expiry"),
+        (mint_token(iss=userpool_iss, exp=float("-inf")), "Token has no valid expiry"),
+        (mint_token(iss=userpool_iss, exp=float("inf")), "Token has no valid expiry"),
+        (mint_token(iss=userpool_iss, exp=float("nan")), "Token has no valid expiry"),
+        (mint_token(iss=userpool_iss, exp=-10 ** 400), "Token has no valid expiry"),
+        (mint_token(iss=userpool_iss, expires_in=-1), "Token has expired"),
+        (mint_token(iss=userpool_iss, nbf=2 ** 40), "Token is not valid yet"),
+        (mint_token(iss=userpool_iss, iat=int(time.time()) + 600), "Token is not valid until"),
+    ]
+
+    with patch("cognitoauth.token_verification._resolve_key") as mock_resolve:
+        for token, expected_msg in rejected:
+            passed, msg = auth.validate_jwt(token, userpool_iss, userpool_keys)
+            assert passed is False and msg.startswith(expected_msg)
+        assert mock_resolve.call_count == 0
+
+    ###########################################################################
+    # Test case: the messages of times no timedelta can hold are formatted without them
+    assert format_message(FailureReason.EXPIRED, -1e300) == "Token has expired"
+    assert format_message(FailureReason.NOT_YET_VALID, float("nan")) == "Token is not valid yet"
+    assert format_message(FailureReason.NOT_YET_VALID, None) == "Token is not valid yet"
+
+
+def test_unhashable_kid():
+    """Test tokens with a kid or alg which is not a string are rejected as malformed
+    """
+    userpool_iss = TEST_ISS
+    userpool_keys = jwks("test-kid-1")["keys"]
+
+    _, claims, _ = mint_token(iss=userpool_iss).split(".")
+    for header in [b'{"alg": "RS256", "kid": [1]}', b'{"alg": "RS256", "kid": {"a": 1}}',
+                   b'{"alg": ["RS256"], "kid": "test-kid-1"}']:
+        token = ".".join([base64url_encode(header).decode(), claims, ""])
+        for keys in [userpool_keys, JwkSet(userpool_keys)]:
+            passed, msg = auth.validate_jwt(token, userpool_iss, keys)
+            assert passed is False and msg.startswith("Failed to decode token")
+        assert auth.verify_token(token, userpool_iss, userpool_keys)[2].startswith("Failed to decode token")
+
+        mock_request = Mock()
+        mock_request.headers.get = Mock(return_value=token)
+        result = auth.authorise_request_result(mock_request, TEST_REGION, TEST_USERPOOL_ID, userpool_keys)
+        assert not result and result.reason is FailureReason.MALFORMED
+
+    assert JwkSet(userpool_keys).get_key([1]) is None
+    assert JwkSet(userpool_keys).get_jwk({"a": 1}) is None
+    assert [1] not in JwkSet(userpool_keys)
 
 
 def test_get_username_from_token():
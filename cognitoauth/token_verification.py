@@ -1,55 +1,114 @@
-import datetime
-from jose import jwt, jws
+import json
 import logging
-import requests
+import time
+
+from cognitoauth import instrumentation
+from cognitoauth.jwks import ALLOWED_ALGORITHMS, JwkSet
+from cognitoauth.reasons import FailureReason, format_message
+from cognitoauth.result import VerificationResult
+from cognitoauth.utils import base64url_decode
 
 log = logging.getLogger(__name__)
 
 
 BEARER_PREFIX = "Bearer "
 
+# (connect, read) timeouts in seconds when downloading the JWT Set
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Cognito tokens are a few KB; larger strings are rejected before being decoded
+MAX_TOKEN_LENGTH = 16384
+
+# Seconds of clock skew allowed between the issuer and the time a token is verified at, for its iat and nbf
+NOT_BEFORE_LEEWAY = 60
+
+# Time claims beyond the end of year 9999, as datetime allows, are invalid
+MAX_EPOCH_TIME = 253402300800
+
 """
 # Download the JWT Set of the user pool - invariant, and return the JSON Web Keys.
 # Could be run only once
 userpool_iss = cognito_userpool_iss(cognito_region, cognito_userpool_id)
-userpool_keys = cognito_userpool_keys(userpool_iss)
+userpool_keys = JwkSet(cognito_userpool_keys(userpool_iss))
 """
 
 
-def authorise_request(request, cognito_region, cognito_userpool_id, userpool_keys):
+def authorise_request(request, cognito_region, cognito_userpool_id, userpool_keys, token_cache=None,
+                      revocation_list=None):
     """
     :param token: Cognito token
     :param cognito_region: string with region for Cognito User Pool
     :param cognito_userpool_id: string with Cognito User Pool ID
-    :param userpool_keys: JSON Web Keys
+    :param userpool_keys: JwkSet, or JSON Web Keys
+    :param token_cache: optional TokenCache of verified tokens
+    :param revocation_list: optional RevocationList of revoked tokens
     :return: username
     """
     token = retrieve_header_token(request)
 
-    username = get_username_from_token(token)
-    if username is None:
-        raise Exception("Username not found in token")
-
     userpool_iss = cognito_userpool_iss(cognito_region, cognito_userpool_id)
 
-    passed, err_msg = validate_jwt(token, userpool_iss, userpool_keys)
-    if passed is False:
+    claims, username, err_msg = verify_token(token, userpool_iss, userpool_keys, token_cache,
+                                             revocation_list=revocation_list)
+    if err_msg is not None:
         raise Exception("Token validation failed: {}".format(err_msg))
+    if username is None:
+        instrumentation.get_instrumentation().count("rejected", FailureReason.MISSING_USERNAME.value)
+        raise Exception(format_message(FailureReason.MISSING_USERNAME))
 
     return username
 
 
+def authorise_request_result(request, cognito_region, cognito_userpool_id, userpool_keys, token_cache=None,
+                             revocation_list=None):
+    """
+    Same as authorise_request, returning the outcome instead of raising when the request is not authorised
+    :param request: request with the token in its Authorization header
+    :param cognito_region: string with region for Cognito User Pool
+    :param cognito_userpool_id: string with Cognito User Pool ID
+    :param userpool_keys: JwkSet, or JSON Web Keys
+    :param token_cache: optional TokenCache of verified tokens
+    :param revocation_list: optional RevocationList of revoked tokens
+    :return: VerificationResult; true if authorised, with the username and the claims of the token
+    """
+    token = header_token(request.headers.get("Authorization", None))
+    if token is None:
+        instrumentation.get_instrumentation().count("rejected", FailureReason.NO_TOKEN.value)
+        return VerificationResult.rejected(FailureReason.NO_TOKEN)
+
+    userpool_iss = cognito_userpool_iss(cognito_region, cognito_userpool_id)
+
+    result = verify_token_result(token, userpool_iss, userpool_keys, token_cache,
+                                 revocation_list=revocation_list)
+    if result and result.username is None:
+        instrumentation.get_instrumentation().count("rejected", FailureReason.MISSING_USERNAME.value)
+        return VerificationResult.rejected(FailureReason.MISSING_USERNAME)
+    return result
+
+
 def retrieve_header_token(request):
     """Retrieve token from the header of the given request
     """
-    token = request.headers.get("Authorization", None)
-    if not token:
-        raise Exception("No token found in header")
-    if token.startswith(BEARER_PREFIX):
-        token = token[len(BEARER_PREFIX):]
+    token = header_token(request.headers.get("Authorization", None))
+    if token is None:
+        instrumentation.get_instrumentation().count("rejected", FailureReason.NO_TOKEN.value)
+        raise Exception(format_message(FailureReason.NO_TOKEN))
     return token
 
 
+def header_token(authorization):
+    """
+    Retrieve token from the value of an Authorization header, without raising
+    :param authorization: string with the value of the header; None if missing
+    :return: string with the token; None if there is no token
+    """
+    if not authorization:
+        return None
+    if authorization.startswith(BEARER_PREFIX):
+        authorization = authorization[len(BEARER_PREFIX):]
+    return authorization
+
+
 def cognito_userpool_iss(cognito_region, cognito_userpool_id):
     """
     Return the iss of the Cognito User Pool
@@ -67,77 +126,281 @@ def cognito_userpool_jwt_set(cognito_userpool_iss):
     return "{}/.well-known/jwks.json".format(cognito_userpool_iss)
 
 
-def cognito_userpool_keys(cognito_userpool_iss):
+def cognito_userpool_keys(cognito_userpool_iss, session=None, timeout=DEFAULT_TIMEOUT):
     """
     Download the JWT Set of the user pool - invariant, and return the JSON Web Keys.
     :param cognito_userpool_iss: string with Cognito User Pool ISS
+    :param session: optional requests.Session to reuse its connections
+    :param timeout: (connect, read) timeouts in seconds
     :return: json with JSON Web Keys
     """
+    instrument = instrumentation.get_instrumentation()
+    start = time.perf_counter()
     try:
+        if session is None:
+            # Imported on first download only, to keep the import of this module light
+            import requests
+            session = requests
         jwt_set_url = cognito_userpool_jwt_set(cognito_userpool_iss)
-        jwt_set = requests.get(jwt_set_url).json()
-        return jwt_set["keys"]
+        response = session.get(jwt_set_url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()["keys"]
     except Exception as e:
         log.error("Failed to download JWT set: {}".format(e))
+        instrument.count("jwks_download_failed")
         return None
+    finally:
+        instrument.timing("jwks_download", time.perf_counter() - start)
 
 
-def validate_jwt(token, userpool_iss, userpool_keys):
+def validate_jwt(token, userpool_iss, userpool_keys, token_cache=None, now=None, revocation_list=None):
     """
     Perform the token validation steps as per
     https://docs.aws.amazon.com/cognito/latest/developerguide/amazon-cognito-user-pools-using-tokens-with-identity-providers.html
     :param token: jwt string
     :param userpool_iss: string with url base to check issuer
-    :param userpool_keys: json with JSON Web Keys of the User Pool
+    :param userpool_keys: JwkSet, or json with JSON Web Keys of the User Pool
+    :param token_cache: optional TokenCache of verified tokens
+    :param now: optional epoch time in seconds at which the token must be valid, see verify_token
+    :param revocation_list: optional RevocationList of revoked tokens
     :return: True if validation succeeds; False otherwise
     """
-    def result(msg=None):
-        return (True, None) if msg is None else (False, msg)
+    result = verify_token_result(token, userpool_iss, userpool_keys, token_cache, now, revocation_list)
+    return (True, None) if result else (False, result.message)
+
+
+def verify_token(token, userpool_iss, userpool_keys, token_cache=None, now=None, revocation_list=None):
+    """
+    Perform the token validation steps in a single pass: the token is split and decoded once and its
+    signature is verified once.
+
+    The audience is not checked: ID tokens of every app client of the User Pool are accepted. Check the aud (ID
+    tokens) or client_id (access tokens) claim of the result, e.g. with the client_ids of a cognitoauth.policy
+    requirement, to accept the tokens of some app clients only.
+    :param token: jwt string
+    :param userpool_iss: string with url base to check issuer
+    :param userpool_keys: JwkSet, or json with JSON Web Keys of the User Pool
+    :param token_cache: optional TokenCache; a cached token is returned without any crypto
+    :param now: optional epoch time in seconds at which the token must be valid, e.g. the time of a logged
+        request; the current time by default. The token cache is not used with another time. A token issued (iat) or
+        valid (nbf) more than NOT_BEFORE_LEEWAY seconds after that time is rejected.
+    :param revocation_list: optional RevocationList; revoked tokens are rejected, even if cached
+    :return: tuple (claims, username, err_msg); claims and username are None if validation fails,
+        err_msg is None if validation succeeds
+    """
+    return verify_token_result(token, userpool_iss, userpool_keys, token_cache, now, revocation_list).as_tuple()
+
+
+def verify_token_result(token, userpool_iss, userpool_keys, token_cache=None, now=None, revocation_list=None):
+    """
+    Same as verify_token, returning a VerificationResult whose error message is only formatted when read
+    :return: VerificationResult; true if the token is verified
+    """
+    if now is not None:
+        return _verify(token, userpool_iss, userpool_keys, None, now=now, revocation_list=revocation_list)
+
+    if token_cache is not None:
+        cached = _cached_result(token, userpool_iss, token_cache, revocation_list)
+        if cached is not None:
+            return cached
+
+    return _verify(token, userpool_iss, userpool_keys, token_cache, revocation_list=revocation_list)
+
+
+def _cached_token(token, userpool_iss, token_cache, revocation_list=None, issuers=None):
+    """
+    Look the token up in the cache
+    :return: tuple (claims, username, err_msg) of a cached token; None if not cached
+    """
+    cached = _cached_result(token, userpool_iss, token_cache, revocation_list, issuers)
+    return None if cached is None else cached.as_tuple()
+
+
+def _cached_result(token, userpool_iss, token_cache, revocation_list=None, issuers=None):
+    """
+    Look the token up in the cache
+    :param token: jwt string
+    :param userpool_iss: string with url base to check issuer
+    :param token_cache: TokenCache
+    :param revocation_list: optional RevocationList; tokens may be revoked after being cached
+    :param issuers: optional container of the issuers accepted instead of userpool_iss
+    :return: VerificationResult of a cached token; None if not cached
+    """
+    # The cache may be shared by several user pools
+    cached = token_cache.get(token, (userpool_iss,) if issuers is None else issuers)
+    if cached is not None:
+        instrument = instrumentation.get_instrumentation()
+        instrument.count("cache_hit")
+        if revocation_list is not None and revocation_list.is_revoked(cached[1]):
+            instrument.count("rejected", FailureReason.REVOKED.value)
+            return VerificationResult.rejected(FailureReason.REVOKED)
+        return VerificationResult(cached[1], cached[0])
+    return None
+
+
+def _verify_token(token, userpool_iss, userpool_keys, token_cache, decoded=None, now=None, revocation_list=None):
+    """
+    Same as verify_token without the cache lookup; the verified token is added to token_cache if any
+    :return: tuple (claims, username, err_msg) as returned by verify_token
+    """
+    return _verify(token, userpool_iss, userpool_keys, token_cache, decoded, now, revocation_list).as_tuple()
+
+
+def _verify(token, userpool_iss, userpool_keys, token_cache, decoded=None, now=None, revocation_list=None):
+    """
+    Same as verify_token_result without the cache lookup; the verified token is added to token_cache if any
+    :param decoded: optional tuple returned by _decode_token(token), if already decoded
+    :param now: optional epoch time in seconds at which the token must be valid; the current time by default
+    :param revocation_list: optional RevocationList of revoked tokens, checked after the signature
+    :return: VerificationResult
+    """
+    instrument = instrumentation.get_instrumentation()
+    marks = None if instrument is instrumentation.NULL_INSTRUMENTATION else [time.perf_counter()]
+
+    def stage(name):
+        # Report the time spent since the previous stage
+        if marks is not None:
+            now = time.perf_counter()
+            instrument.timing(name, now - marks[0])
+            marks[0] = now
+
+    def result(claims=None, reason=None, detail=None):
+        if reason is not None:
+            instrument.count("rejected", reason.value)
+            return VerificationResult.rejected(reason, detail)
+        username = _username_from_claims(claims)
+        if token_cache is not None:
+            token_cache.put(token, username, claims)
+        instrument.count("verified")
+        return VerificationResult(claims, username)
 
     log.debug("Validating token")
 
     # 2 Decode the token string into JWT format.
-    jwt_headers = jwt.get_unverified_header(token)
-    kid = jwt_headers["kid"]
-    use_keys = [key for key in userpool_keys if key["kid"] == kid]
-    if len(use_keys) != 1:
-        return result("Obtained keys are wrong")
-    use_key = use_keys[0]
     try:
-        jwt.decode(token, use_key)
+        jwt_headers, claims, signing_input, signature = decoded or _decode_token(token)
+        kid = jwt_headers["kid"]
+        alg = jwt_headers["alg"]
+        if not isinstance(kid, str) or not isinstance(alg, str):
+            raise ValueError("Invalid kid or alg in token header")
+    except Exception as e:
+        return result(reason=FailureReason.MALFORMED, detail=e)
+    stage("decode")
+
+    # Reject malformed, foreign, expired and not yet valid tokens before any crypto
+    rejected = _reject_unverified(jwt_headers, claims, userpool_iss, time.time() if now is None else now)
+    stage("claims")
+    if rejected is not None:
+        return result(reason=rejected[0], detail=rejected[1])
+
+    # 5 Check kid
+    use_key = _resolve_key(userpool_keys, kid)
+    stage("key_lookup")
+    if use_key is None:
+        return result(reason=FailureReason.UNKNOWN_KID)
+    key_alg, key = use_key
+
+    # 6 Verify signature of decoded JWT
+    if alg != key_alg:
+        return result(reason=FailureReason.ALGORITHM_NOT_ALLOWED, detail=alg)
+    try:
+        verified = key.verify(signing_input, signature)
     except Exception as e:
-        return result("Failed to decode token: {}".format(e))
+        return result(reason=FailureReason.INVALID_SIGNATURE, detail=e)
+    finally:
+        stage("signature")
+    if not verified:
+        return result(reason=FailureReason.INVALID_SIGNATURE)
+
+    if revocation_list is not None:
+        revoked = revocation_list.is_revoked(claims)
+        stage("revocation")
+        if revoked:
+            return result(reason=FailureReason.REVOKED)
+
+    return result(claims)
+
+
+def _reject_unverified(jwt_headers, claims, userpool_iss, now, not_before_leeway=NOT_BEFORE_LEEWAY):
+    """
+    Check the unverified header and claims of the token, so that tokens which would fail anyway do not cost
+    a signature check
+    :param jwt_headers: dict with the unverified header of the token
+    :param claims: dict with the unverified claims of the token
+    :param userpool_iss: string with url base to check issuer
+    :param now: current epoch time in seconds
+    :param not_before_leeway: seconds of clock skew after which a token issued (iat) or valid (nbf) after now is
+        rejected
+    :return: tuple (FailureReason, detail); None if the token may be valid
+    """
+    alg = jwt_headers.get("alg")
+    if alg not in ALLOWED_ALGORITHMS:
+        return FailureReason.ALGORITHM_NOT_ALLOWED, alg
 
     # 3 Check iss claim
-    claims = jwt.get_unverified_claims(token)
-    if claims["iss"] != userpool_iss:
-        return result("Invalid issuer in token")
+    if claims.get("iss") != userpool_iss:
+        return FailureReason.INVALID_ISSUER, None
 
     # 4 Check token use
     # Should we only allow one of the tokens or both "id" and "access"?
-    if claims["token_use"] not in ["id", "access"]:
-        return result("Token not of valid use")
+    if claims.get("token_use") not in ["id", "access"]:
+        return FailureReason.INVALID_TOKEN_USE, None
 
-    # 5 Check kid
-    jwk_kids = [obj["kid"] for obj in userpool_keys]
-    if kid not in jwk_kids:
-        # Should be here; condition 2 should have guaranteed this
-        return result("Token is not related to id provider")
+    # 7 Check exp and make sure it is not expired
+    exp = claims.get("exp")
+    if not _is_epoch_time(exp):
+        return FailureReason.INVALID_EXPIRY, None
+    if exp < now:
+        return FailureReason.EXPIRED, exp - now
 
-    # 6 Verify signature of decoded JWT?
-    try:
-        jws.verify(token, use_key, jwt_headers["alg"])
-    except Exception as e:
-        return result("Failed to verify signature {}".format(e))
+    for name in ("nbf", "iat"):
+        not_before = claims.get(name)
+        if isinstance(not_before, (int, float)) and not_before > now + not_before_leeway:
+            return FailureReason.NOT_YET_VALID, not_before - now if _is_epoch_time(not_before) else None
+
+    return None
+
+
+def _is_epoch_time(value):
+    """
+    :param value: value of a time claim of the token
+    :return: True if value is a number of seconds between the years -9999 and 9999; False for NaN and infinities
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and -MAX_EPOCH_TIME < value < MAX_EPOCH_TIME
 
-    # 7 Check exp and make sure it is not expired
-    exp = claims["exp"]
-    exp_date = datetime.datetime.utcfromtimestamp(exp)
-    now = datetime.datetime.utcnow()
-    if exp_date < now:
-        return result("Token has expired {}".format(exp_date - now))
 
-    return result(None)
+def _resolve_key(userpool_keys, kid):
+    """
+    Find the key the token was signed with
+    :param userpool_keys: JwkSet, or json with JSON Web Keys of the User Pool
+    :param kid: string with the kid of the token
+    :return: tuple (alg, key); None if the key is not found or not unique
+    """
+    if hasattr(userpool_keys, "get_key"):
+        return userpool_keys.get_key(kid)
+    # Plain list of JSON Web Keys: only the matching key is built, on every call
+    return JwkSet([key for key in userpool_keys or [] if key.get("kid") == kid]).get_key(kid)
+
+
+def _decode_token(token):
+    """
+    Split the token and decode its segments, without verifying it
+    :param token: jwt string
+    :return: tuple (headers, claims, signing_input, signature)
+    """
+    if isinstance(token, str):
+        token = token.encode("utf-8")
+    if len(token) > MAX_TOKEN_LENGTH:
+        raise ValueError("Token is larger than {} bytes".format(MAX_TOKEN_LENGTH))
+    if token.count(b".") != 2:
+        raise ValueError("Token must have 3 segments")
+    signing_input, signature_segment = token.rsplit(b".", 1)
+    header_segment, claims_segment = signing_input.split(b".", 1)
+    headers = json.loads(base64url_decode(header_segment))
+    claims = json.loads(base64url_decode(claims_segment))
+    if not isinstance(headers, dict) or not isinstance(claims, dict):
+        raise ValueError("Invalid token segments")
+    return headers, claims, signing_input, base64url_decode(signature_segment)
 
 
 def get_username_from_token(token):
@@ -146,8 +409,18 @@ def get_username_from_token(token):
     :param token: string with cognito JWT
     :return: string with username; None if unable to identify the username
     """
-    claims = jwt.get_unverified_claims(token)
+    if isinstance(token, str):
+        token = token.encode("utf-8")
+    claims = json.loads(base64url_decode(token.split(b".")[1]))
+    return _username_from_claims(claims)
+
 
+def _username_from_claims(claims):
+    """
+    Get the cognito username from the claims of the token
+    :param claims: dict with the claims of the token
+    :return: string with username; None if unable to identify the username
+    """
     # Example of claims of Access token =
     # {'scope': 'aws.cognito.signin.user.admin', 'exp': 1507256126,
     # 'sub': 'f1c4cf9f-8dea-446d-9900-xxxxxxxxxxxx',
@@ -162,9 +435,9 @@ def get_username_from_token(token):
     # 'auth_time': 1507252526, 'aud': 'xxxxxxxxxxxxxxxxxxxxxxxxxx',
     # 'iat': 1507252526, 'cognito:username': 'user@example.com'}
 
-    use = claims["token_use"]
+    use = claims.get("token_use")
     if use == "id":
-        return claims["cognito:username"]
+        return claims.get("cognito:username")
     if use == "access":
-        return claims["username"]
+        return claims.get("username")
     return None
@@ -0,0 +1,12 @@
+import base64
+
+
+def base64url_decode(data):
+    """
+    Decode a base64url segment of a token, whose padding is stripped
+    :param data: bytes or ascii string
+    :return: bytes
+    """
+    if isinstance(data, str):
+        data = data.encode("ascii")
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
@@ -17,6 +17,17 @@ __requirements__ = [
     "requests[security]"
 ]
 
+__extras__ = {
+    # Verify the signatures with cryptography instead of python-jose
+    "cryptography": ["cryptography"],
+}
+
+__entry_points__ = {
+    "console_scripts": [
+        "cognitoauth-verify = cognitoauth.cli:main",
+    ],
+}
+
 __long_description__ = ""
 try:
     # Reformat description as PyPi use ReStructuredText rather than Markdown
@@ -44,14 +55,16 @@ setup(
     # data_files parameter is only required for files outside the packages, used in conjunction with the MANIFEST.in
     data_files=[("", ["ReleaseNotes.md"]),],
     description=__summary__,
+    entry_points=__entry_points__,
     install_requires=__requirements__,
+    extras_require=__extras__,
     long_description=__long_description__,
     name=__title__,
     # For data inside packages can use the automatic inclusion
     #   include_package_data = True,
     # or the explicit inclusion, e.g.:
     #   package_data={ "package_name": ["data.file1", "data.file2" , ...] }
-    packages=find_packages(exclude=["tests"]),
+    packages=find_packages(exclude=["tests", "benchmarks", "benchmarks.*"]),
     url=__uri__,
     version=__version__,
     zip_safe=False,